@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def path_digest(path):
+    """
+    SHA-256 of a file, or of every file below a directory (names included);
+    None if the path doesn't exist.
+    """
+    path = Path(path)
+    if path.is_file():
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for file_path in sorted(p for p in path.rglob('*') if p.is_file()):
+            digest.update(str(file_path.relative_to(path)).encode('utf-8'))
+            digest.update(path_digest(file_path).encode('ascii'))
+        return digest.hexdigest()
+    return None
+
+
+def code_version(source_files):
+    """Digest of the source files implementing the pipeline"""
+    digest = hashlib.sha256()
+    for source_file in source_files:
+        digest.update((path_digest(source_file) or '').encode('ascii'))
+    return digest.hexdigest()
+
+
+class BuildGraph:
+    """
+    Make-style DAG of pipeline stages with persistent, fingerprinted results.
+
+    A stage's fingerprint covers the code version, its parameters, the
+    contents of its input files and the results of the stages it depends on.
+    After a stage runs, its result and the digests of the files it wrote are
+    stamped into the build directory; on the next run it is skipped if the
+    fingerprint is unchanged and its output files are still as it left them.
+    A stage that returns None or False failed and is not stamped, so an
+    interrupted or failed build resumes from the first stage that didn't
+    complete. A stage can also decline stamping a successful result (e.g.
+    an environment check that found something missing), so it runs again
+    next time while dependents still get its result.
+    """
+
+    def __init__(self, build_dir, version=''):
+        self.build_dir = Path(build_dir)
+        self.version = version
+        self.stages = {}
+        self.results = {}   # stage name -> result of this run
+        self.digests = {}   # stage name -> digest of its result and outputs
+        self.executed = []  # stages that actually ran (were not up to date)
+
+    def add_stage(self, name, func, deps=(), inputs=(), params=None, outputs=(), stamp=None):
+        """
+        Register a stage.
+
+        Args:
+            func: Called with the results of deps, in order; returns a
+                  JSON-serializable result, None/False on failure
+            deps: Names of the stages this one depends on
+            inputs: Files (or directories) whose contents it reads
+            params: JSON-serializable settings that affect its result
+            outputs: Files (or directories) it writes
+            stamp: Called with a successful result; returns False if the
+                   result must not be stamped (default: always stamp)
+        """
+        self.stages[name] = {
+            'func': func,
+            'deps': list(deps),
+            'inputs': [str(path) for path in inputs if path],
+            'params': params or {},
+            'outputs': [str(path) for path in outputs],
+            'stamp': stamp,
+        }
+
+    def stamp_path(self, name):
+        return self.build_dir / f"{name}.stamp.json"
+
+    def load_stamp(self, name):
+        try:
+            with open(self.stamp_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_stamp(self, name, stamp):
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        stamp_path = self.stamp_path(name)
+        temp_path = stamp_path.with_name(f"{stamp_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f, indent=1)
+        os.replace(temp_path, stamp_path)
+
+    def fingerprint(self, name):
+        stage = self.stages[name]
+        payload = {
+            'stage': name,
+            'code': self.version,
+            'params': stage['params'],
+            'inputs': {path: path_digest(path) for path in stage['inputs']},
+            'deps': [self.digests[dep] for dep in stage['deps']],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def run(self, name):
+        """
+        Bring a stage and everything it depends on up to date.
+
+        Returns:
+            The stage's result (from this run or its stamp), None on failure
+        """
+        if name in self.results:
+            return self.results[name]
+        stage = self.stages[name]
+
+        dep_results = []
+        for dep in stage['deps']:
+            dep_result = self.run(dep)
+            if dep_result is None or dep_result is False:
+                self.results[name] = None
+                return None
+            dep_results.append(dep_result)
+
+        fingerprint = self.fingerprint(name)
+        stamp = self.load_stamp(name)
+        if (stamp and stamp.get('fingerprint') == fingerprint
+                and all(path_digest(path) == digest for path, digest in stamp['outputs'].items())):
+            print(f"[OK] Stage {name} is up to date")
+            result, output_digests = stamp['result'], stamp['outputs']
+        else:
+            result = stage['func'](*dep_results)
+            self.executed.append(name)
+            if result is None or result is False:
+                self.results[name] = None
+                return None
+            output_digests = {path: path_digest(path) for path in stage['outputs']}
+            if stage['stamp'] is None or stage['stamp'](result):
+                self.save_stamp(name, {'fingerprint': fingerprint, 'result': result, 'outputs': output_digests})
+            else:
+                self.stamp_path(name).unlink(missing_ok=True)
+
+        # Dependents see the result itself, so a stage that re-ran but
+        # produced the same output doesn't invalidate them
+        self.digests[name] = hashlib.sha256(
+            json.dumps([result, output_digests], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.results[name] = result
+        return result
@@ -0,0 +1,743 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = ".cache"
+STATS_FILE = "stats.json"
+
+# Entry layout: magic, codec id, SHA-256 of the uncompressed value, payload
+ENTRY_MAGIC = b'DFC1'
+HEADER_SIZE = len(ENTRY_MAGIC) + 1 + 32
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+
+COUNTERS = ('hits', 'misses', 'writes', 'evictions', 'corrupt')
+
+
+class CorruptEntry(ValueError):
+    """A stored entry failed its header or checksum check"""
+
+
+def compress(value, codec):
+    if codec == 'zlib':
+        import zlib
+        return zlib.compress(value, 6)
+    if codec == 'lzma':
+        import lzma
+        return lzma.compress(value)
+    return value
+
+
+def decompress(payload, codec_id):
+    try:
+        if codec_id == CODECS['zlib']:
+            import zlib
+            return zlib.decompress(payload)
+        if codec_id == CODECS['lzma']:
+            import lzma
+            return lzma.decompress(payload)
+    except Exception as e:
+        raise CorruptEntry(f"cannot decompress entry: {e}")
+    if codec_id != CODECS['none']:
+        raise CorruptEntry(f"unknown codec {codec_id}")
+    return payload
+
+
+def encode_entry(value, codec='none', digest=None):
+    """
+    Wrap a value for storage. The payload is compressed with codec unless
+    that doesn't make it smaller (already compressed PDFs and PNGs).
+    """
+    digest = digest or hashlib.sha256(value).digest()
+    payload = compress(value, codec)
+    if codec == 'none' or len(payload) >= len(value):
+        codec, payload = 'none', value
+    return ENTRY_MAGIC + bytes([CODECS[codec]]) + digest + payload
+
+
+def decode_entry(blob, verify=True):
+    """
+    Unwrap a stored entry.
+
+    Raises:
+        CorruptEntry: If the header is wrong, the payload doesn't decompress
+                      or (with verify) the value doesn't match its checksum
+    """
+    if len(blob) < HEADER_SIZE or blob[:len(ENTRY_MAGIC)] != ENTRY_MAGIC:
+        raise CorruptEntry("bad entry header")
+    codec_id = blob[len(ENTRY_MAGIC)]
+    digest = blob[len(ENTRY_MAGIC) + 1:HEADER_SIZE]
+    value = decompress(blob[HEADER_SIZE:], codec_id)
+    if verify and hashlib.sha256(value).digest() != digest:
+        raise CorruptEntry("checksum mismatch")
+    return value
+
+
+def write_atomic(path, data):
+    """Write bytes to path via a temporary file in the same directory"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class MemoryBackend:
+    """In-process LRU of entries, bounded by total size"""
+
+    name = 'memory'
+    persistent = False
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (namespace, key) -> (created, blob)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.on_evict = lambda namespace: None
+
+    def get(self, namespace, key, ttl=None):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None:
+                return None
+            if ttl is not None and time.time() - entry[0] > ttl:
+                self._remove((namespace, key))
+                self.on_evict(namespace)
+                return None
+            self.entries.move_to_end((namespace, key))
+            return entry[1]
+
+    def put(self, namespace, key, blob):
+        # Entries that would push most of the LRU out aren't worth keeping in memory
+        if len(blob) > self.max_bytes // 4:
+            return
+        with self.lock:
+            self._remove((namespace, key))
+            self.entries[(namespace, key)] = (time.time(), blob)
+            self.size += len(blob)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.on_evict(oldest[0])
+
+    def delete(self, namespace, key):
+        with self.lock:
+            self._remove((namespace, key))
+
+    def _remove(self, entry_key):
+        entry = self.entries.pop(entry_key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def sweep(self, ttl_for):
+        with self.lock:
+            now = time.time()
+            for entry_key, (created, _) in list(self.entries.items()):
+                ttl = ttl_for(entry_key[0])
+                if ttl is not None and now - created > ttl:
+                    self._remove(entry_key)
+                    self.on_evict(entry_key[0])
+
+    def usage(self):
+        usage = {}
+        with self.lock:
+            for (namespace, _), (_, blob) in self.entries.items():
+                entries, size = usage.get(namespace, (0, 0))
+                usage[namespace] = (entries + 1, size + len(blob))
+        return usage
+
+    def close(self):
+        pass
+
+
+class DiskBackend:
+    """
+    One file per entry under root/<namespace>/<key[:2]>/<key>.
+
+    Writes are atomic (temporary file + rename). A file's mtime is its write
+    time, used for the TTL; its atime is set explicitly on every hit, so the
+    size sweep removes the least recently used entries first regardless of
+    how the file system is mounted.
+    """
+
+    name = 'disk'
+    persistent = True
+
+    def __init__(self, root, max_bytes=2 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.lock = threading.Lock()
+        self.on_evict = lambda namespace: None
+
+    def path(self, namespace, key):
+        return self.root / namespace / key[:2] / key
+
+    def get(self, namespace, key, ttl=None):
+        path = self.path(namespace, key)
+        try:
+            stat = path.stat()
+            if ttl is not None and time.time() - stat.st_mtime > ttl:
+                path.unlink()
+                self.on_evict(namespace)
+                return None
+            with open(path, 'rb') as f:
+                blob = f.read()
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            return None
+        return blob
+
+    def put(self, namespace, key, blob):
+        write_atomic(self.path(namespace, key), blob)
+        with self.lock:
+            self.written += len(blob)
+            sweep_due = self.written > self.max_bytes // 8
+        if sweep_due:
+            self.sweep(lambda namespace: None)
+
+    def delete(self, namespace, key):
+        try:
+            self.path(namespace, key).unlink()
+        except OSError:
+            pass
+
+    def _files(self):
+        if not self.root.is_dir():
+            return
+        for namespace_dir in self.root.iterdir():
+            if not namespace_dir.is_dir():
+                continue
+            for path in namespace_dir.glob('*/*'):
+                if path.name.endswith('.tmp'):
+                    continue
+                try:
+                    yield namespace_dir.name, path, path.stat()
+                except OSError:
+                    continue
+
+    def sweep(self, ttl_for):
+        """Remove expired entries, then least recently used ones down to max_bytes"""
+        with self.lock:
+            self.written = 0
+        now = time.time()
+        live = []
+        total = 0
+        for namespace, path, stat in self._files():
+            ttl = ttl_for(namespace)
+            if ttl is not None and now - stat.st_mtime > ttl:
+                self._evict(namespace, path)
+                continue
+            live.append((stat.st_atime, stat.st_size, namespace, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, namespace, path in sorted(live):
+            self._evict(namespace, path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _evict(self, namespace, path):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        self.on_evict(namespace)
+
+    def usage(self):
+        usage = {}
+        for namespace, _, stat in self._files():
+            entries, size = usage.get(namespace, (0, 0))
+            usage[namespace] = (entries + 1, size + stat.st_size)
+        return usage
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    All entries in one SQLite database (WAL mode), which keeps many small
+    entries out of the file system. Each thread uses its own connection.
+    """
+
+    name = 'sqlite'
+    persistent = True
+
+    def __init__(self, db_path, max_bytes=2 << 30):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections = []
+        self.on_evict = lambda namespace: None
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            import sqlite3
+
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' namespace TEXT, key TEXT, value BLOB, size INTEGER,'
+                ' created REAL, accessed REAL, PRIMARY KEY (namespace, key))')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            connection.commit()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def get(self, namespace, key, ttl=None):
+        connection = self.connection()
+        row = connection.execute('SELECT value, created FROM entries WHERE namespace = ? AND key = ?',
+                                 (namespace, key)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if ttl is not None and now - row[1] > ttl:
+            self.delete(namespace, key)
+            self.on_evict(namespace)
+            return None
+        with connection:
+            connection.execute('UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                               (now, namespace, key))
+        return bytes(row[0])
+
+    def put(self, namespace, key, blob):
+        connection = self.connection()
+        now = time.time()
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                               (namespace, key, blob, len(blob), now, now))
+        with self.lock:
+            self.written += len(blob)
+            sweep_due = self.written > self.max_bytes // 8
+        if sweep_due:
+            self.sweep(lambda namespace: None)
+
+    def delete(self, namespace, key):
+        connection = self.connection()
+        with connection:
+            connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def sweep(self, ttl_for):
+        """Remove expired entries, then least recently used ones down to max_bytes"""
+        with self.lock:
+            self.written = 0
+        connection = self.connection()
+        now = time.time()
+        rows = connection.execute('SELECT namespace, key, size, created FROM entries ORDER BY accessed').fetchall()
+        total = sum(row[2] for row in rows)
+        evicted = []
+        for namespace, key, size, created in rows:
+            ttl = ttl_for(namespace)
+            if total > self.max_bytes or (ttl is not None and now - created > ttl):
+                evicted.append((namespace, key))
+                total -= size
+        if not evicted:
+            return
+        with connection:
+            connection.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', evicted)
+        for namespace, _ in evicted:
+            self.on_evict(namespace)
+
+    def usage(self):
+        rows = self.connection().execute(
+            'SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace').fetchall()
+        return {namespace: (entries, size) for namespace, entries, size in rows}
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+
+class HTTPBackend:
+    """
+    Cache shared between build nodes over HTTP (see cache_server.py).
+
+    Storage is content-addressed: /cas/<sha256> holds a blob under the
+    digest of its bytes, which the server checks on upload, and
+    /ac/<namespace>/<key> maps a cache key to that digest, so identical
+    artifacts are stored once. Uploads go through a background thread and
+    never block the conversion; a forked process starts its own, since the
+    parent's thread doesn't exist there. Lookups use a short timeout, and
+    after the first connection error the backend is off for the rest of the
+    run.
+    """
+
+    name = 'http'
+    persistent = True
+
+    def __init__(self, base_url, timeout=2.0, namespaces=None, max_pending=256, flush_timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.namespaces = set(namespaces) if namespaces else None
+        self.flush_timeout = flush_timeout
+        self.max_pending = max_pending
+        self.available = True
+        self.uploads = queue.Queue(max_pending)
+        self.worker = None
+        self.pid = None  # process the upload thread runs in
+        self.lock = threading.Lock()
+        self.on_evict = lambda namespace: None
+
+    def request(self, method, path, data=None):
+        import urllib.request
+
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header('Content-Type', 'application/octet-stream')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    def disable(self, error):
+        if self.available:
+            self.available = False
+            print(f"[WARNING] Remote cache {self.base_url} unavailable, continuing without it: {error}")
+
+    def get(self, namespace, key, ttl=None):
+        if not self.available:
+            return None
+        import urllib.error
+
+        try:
+            digest = self.request('GET', f'/ac/{namespace}/{key}').decode('ascii').strip()
+            return self.request('GET', f'/cas/{digest}')
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                self.disable(e)
+            return None
+        except (OSError, ValueError) as e:
+            self.disable(e)
+            return None
+
+    def put(self, namespace, key, blob):
+        digest = hashlib.sha256(blob).hexdigest()
+        self.submit([('PUT', f'/cas/{digest}', blob), ('PUT', f'/ac/{namespace}/{key}', digest.encode('ascii'))])
+
+    def delete(self, namespace, key):
+        self.submit([('DELETE', f'/ac/{namespace}/{key}', None)])
+
+    def submit(self, requests):
+        """Queue requests for the upload thread; dropped if the queue is full"""
+        if not self.available:
+            return
+        if self.worker is not None and self.pid != os.getpid():
+            # Forked: the queue and lock may be in the state some parent thread left them in
+            self.forget_worker()
+        with self.lock:
+            if self.worker is None:
+                self.pid = os.getpid()
+                self.worker = threading.Thread(target=self.upload, name='cache-upload', daemon=True)
+                self.worker.start()
+        try:
+            self.uploads.put_nowait(requests)
+        except queue.Full:
+            pass
+
+    def upload(self):
+        while True:
+            requests = self.uploads.get()
+            try:
+                if requests is None:
+                    return
+                for method, path, data in requests:
+                    if self.available:
+                        self.request(method, path, data)
+            except Exception as e:
+                self.disable(e)
+            finally:
+                self.uploads.task_done()
+
+    def sweep(self, ttl_for):
+        # The server owns eviction of shared entries
+        pass
+
+    def usage(self):
+        return None
+
+    def forget_worker(self):
+        """Drop the upload thread inherited from a parent process, with its queue"""
+        self.worker = None
+        self.lock = threading.Lock()
+        self.uploads = queue.Queue(self.max_pending)
+
+    def flush(self):
+        """Give queued uploads up to flush_timeout seconds to finish; later puts start a new thread"""
+        if self.worker is not None and self.pid != os.getpid():
+            self.forget_worker()
+        with self.lock:
+            worker, self.worker = self.worker, None
+        if worker is None:
+            return
+        self.uploads.put(None)
+        worker.join(self.flush_timeout)
+
+    def close(self):
+        self.flush()
+
+
+class CacheManager:
+    """
+    Namespaced cache over a list of backends, fastest first.
+
+    A value found in a slower backend is copied into the faster ones. Entries
+    in persistent backends carry a checksum; one that fails it (a truncated
+    or damaged file) is dropped and counts as a miss. Per-namespace TTLs
+    (the '*' entry is the default) and each backend's size limit bound what
+    is kept. Hits, misses, writes, evictions and corrupt entries are counted
+    per namespace and added to the cumulative stats file on close().
+    """
+
+    def __init__(self, backends, compression='zlib', ttl=None, stats_path=None):
+        self.backends = list(backends)
+        self.compression = compression or 'none'
+        self.ttl = dict(ttl or {})
+        self.stats_path = Path(stats_path) if stats_path else None
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.closed = False
+        for backend in self.backends:
+            backend.on_evict = self.count_eviction
+
+    @staticmethod
+    def entry_key(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def backends_for(self, namespace):
+        """Backends that keep this namespace (a backend's namespaces attribute limits it)"""
+        return [backend for backend in self.backends
+                if getattr(backend, 'namespaces', None) is None or namespace in backend.namespaces]
+
+    def ttl_for(self, namespace):
+        return self.ttl.get(namespace, self.ttl.get('*'))
+
+    def count(self, namespace, counter):
+        with self.lock:
+            counts = self.counts.setdefault(namespace, dict.fromkeys(COUNTERS, 0))
+            counts[counter] += 1
+
+    def count_eviction(self, namespace):
+        self.count(namespace, 'evictions')
+
+    def get(self, namespace, key):
+        """
+        Returns:
+            bytes: The cached value, or None on a miss
+        """
+        entry_key = self.entry_key(key)
+        ttl = self.ttl_for(namespace)
+        backends = self.backends_for(namespace)
+        for i, backend in enumerate(backends):
+            blob = backend.get(namespace, entry_key, ttl)
+            if blob is None:
+                continue
+            try:
+                value = decode_entry(blob, verify=backend.persistent)
+            except CorruptEntry:
+                backend.delete(namespace, entry_key)
+                self.count(namespace, 'corrupt')
+                continue
+            if i:
+                self._store(backends[:i], namespace, entry_key, value)
+            self.count(namespace, 'hits')
+            return value
+        self.count(namespace, 'misses')
+        return None
+
+    def put(self, namespace, key, value, compress=True):
+        """Store bytes in every backend; compress=False for already compressed data"""
+        self._store(self.backends_for(namespace), namespace, self.entry_key(key), value, compress)
+        self.count(namespace, 'writes')
+
+    def _store(self, backends, namespace, entry_key, value, compress=True):
+        digest = hashlib.sha256(value).digest()
+        encoded = {}
+        for backend in backends:
+            codec = self.compression if compress and backend.persistent else 'none'
+            if codec not in encoded:
+                encoded[codec] = encode_entry(value, codec, digest)
+            try:
+                backend.put(namespace, entry_key, encoded[codec])
+            except Exception as e:
+                # A full disk or locked database must not fail the conversion
+                print(f"[WARNING] Could not write {namespace} cache entry to {backend.name} backend: {e}")
+
+    def get_json(self, namespace, key):
+        value = self.get(namespace, key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value.decode('utf-8'))
+        except ValueError:
+            return None
+
+    def put_json(self, namespace, key, obj):
+        self.put(namespace, key, json.dumps(obj, sort_keys=True).encode('utf-8'))
+
+    def get_file(self, namespace, key, dest_path):
+        """Write a cached value to dest_path (atomically); return True on a hit"""
+        value = self.get(namespace, key)
+        if value is None:
+            return False
+        write_atomic(dest_path, value)
+        return True
+
+    def put_file(self, namespace, key, src_path, compress=True):
+        with open(src_path, 'rb') as f:
+            self.put(namespace, key, f.read(), compress)
+
+    def sweep(self):
+        for backend in self.backends:
+            try:
+                backend.sweep(self.ttl_for)
+            except Exception as e:
+                print(f"[WARNING] Could not sweep the {backend.name} cache: {e}")
+
+    def load_stats(self):
+        """Cumulative per-namespace counters from earlier runs"""
+        if not self.stats_path:
+            return {}
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """Finish pending remote uploads, e.g. before a worker process returns"""
+        for backend in self.backends:
+            if hasattr(backend, 'flush'):
+                backend.flush()
+
+    def take_counts(self):
+        """This process's counters since the last call (or the last save_stats)"""
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def merge_counts(self, counts):
+        """Add counters taken in another process, e.g. a pool worker (see call_in_worker)"""
+        with self.lock:
+            for namespace, namespace_counts in counts.items():
+                totals = self.counts.setdefault(namespace, dict.fromkeys(COUNTERS, 0))
+                for counter, value in namespace_counts.items():
+                    totals[counter] = totals.get(counter, 0) + value
+
+    def save_stats(self):
+        """Add this run's counters to the stats file"""
+        counts = self.take_counts()
+        if not self.stats_path or not counts:
+            return
+        stats = self.load_stats()
+        for namespace, namespace_counts in counts.items():
+            totals = stats.setdefault(namespace, {})
+            for counter, value in namespace_counts.items():
+                totals[counter] = totals.get(counter, 0) + value
+        write_atomic(self.stats_path, json.dumps(stats, indent=1, sort_keys=True).encode('utf-8'))
+
+    def summary(self):
+        """One line with this run's hit counts per namespace"""
+        with self.lock:
+            return ', '.join(f"{namespace} {counts['hits']}/{counts['hits'] + counts['misses']}"
+                             for namespace, counts in sorted(self.counts.items())
+                             if counts['hits'] + counts['misses'])
+
+    def close(self):
+        """Sweep the backends and record the stats; safe to call more than once"""
+        if self.closed:
+            return
+        self.closed = True
+        self.sweep()
+        self.save_stats()
+        for backend in self.backends:
+            backend.close()
+
+
+def create_cache(backends=('memory', 'disk'), cache_dir=CACHE_DIR, max_bytes=None,
+                 ttl=None, compression='zlib', remote_url=None, remote_namespaces=None):
+    """
+    Build a CacheManager from backend names ('memory', 'disk', 'sqlite',
+    'http'), fastest first. max_bytes maps backend names to size limits;
+    the 'http' backend talks to remote_url and only keeps remote_namespaces
+    (all namespaces if None).
+    """
+    max_bytes = max_bytes or {}
+    cache_dir = Path(cache_dir)
+    instances = []
+    for name in backends:
+        limit = {'max_bytes': max_bytes[name]} if name in max_bytes else {}
+        if name == 'memory':
+            instances.append(MemoryBackend(**limit))
+        elif name == 'disk':
+            instances.append(DiskBackend(cache_dir / "entries", **limit))
+        elif name == 'sqlite':
+            instances.append(SQLiteBackend(cache_dir / "cache.sqlite", **limit))
+        elif name == 'http':
+            if not remote_url:
+                raise ValueError("The http cache backend needs a remote URL")
+            instances.append(HTTPBackend(remote_url, namespaces=remote_namespaces))
+        else:
+            raise ValueError(f"Unknown cache backend: {name}")
+    return CacheManager(instances, compression, ttl, cache_dir / STATS_FILE if instances else None)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache(**settings):
+    """
+    The process-wide cache manager. The first call creates it from settings
+    (see create_cache) and closes it at exit; later calls return it as is.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = create_cache(**settings)
+            atexit.register(_shared_cache.close)
+        return _shared_cache
+
+
+def reset_shared_cache():
+    """
+    Initializer for worker processes: forget the cache manager inherited
+    from the parent, whose SQLite connections and upload thread belong to
+    the parent process, so the worker opens its own backends on first use.
+    """
+    global _shared_cache, _shared_lock
+    _shared_cache = None
+    _shared_lock = threading.Lock()
+
+
+def call_in_worker(func, *args):
+    """
+    Run func(*args) in a worker process (see reset_shared_cache).
+
+    Workers exit without running atexit handlers, so the worker's cache is
+    flushed here (pending remote uploads included) and its counters are
+    returned with the result, for the parent to add with merge_counts.
+
+    Returns:
+        tuple: (result of func, cache counters of the call)
+    """
+    result = func(*args)
+    if _shared_cache is None:
+        return result, {}
+    _shared_cache.flush()
+    return result, _shared_cache.take_counts()
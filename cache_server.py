@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Configuration
+CACHE_ROOT = ".remote_cache"
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_ENTRY_BYTES = 512 << 20     # Reject uploads larger than this
+
+# /cas/<sha256 of the blob> and /ac/<namespace>/<key>; nothing else is served
+CAS_PATTERN = re.compile(r'^/cas/([0-9a-f]{64})$')
+AC_PATTERN = re.compile(r'^/ac/([a-z_]+)/([0-9a-f]{64})$')
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    """
+    Content-addressed GET/PUT store for the http cache backend.
+
+    Blobs are uploaded to /cas/<sha256> and rejected unless their digest
+    matches the address; /ac/<namespace>/<key> holds the digest of the blob
+    stored under a cache key. Files are written atomically below the
+    server's root directory.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def file_path(self):
+        """File backing the request path, or None if the path is invalid"""
+        match = CAS_PATTERN.match(self.path)
+        if match:
+            digest = match.group(1)
+            return self.server.root / 'cas' / digest[:2] / digest
+        match = AC_PATTERN.match(self.path)
+        if match:
+            namespace, key = match.groups()
+            return self.server.root / 'ac' / namespace / key[:2] / key
+        return None
+
+    def reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.file_path()
+        if path is None:
+            return self.reply(400)
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return self.reply(404)
+        self.reply(200, body)
+
+    do_HEAD = do_GET
+
+    def do_PUT(self):
+        path = self.file_path()
+        length = int(self.headers.get('Content-Length') or 0)
+        if path is None or length > MAX_ENTRY_BYTES:
+            self.close_connection = True
+            return self.reply(400)
+        body = self.rfile.read(length)
+
+        cas = CAS_PATTERN.match(self.path)
+        if cas and hashlib.sha256(body).hexdigest() != cas.group(1):
+            return self.reply(400, b'digest mismatch')
+        if not cas and not re.fullmatch(rb'[0-9a-f]{64}', body):
+            return self.reply(400, b'not a digest')
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+        self.reply(201)
+
+    def do_DELETE(self):
+        path = self.file_path()
+        if path is None or not AC_PATTERN.match(self.path):
+            return self.reply(400)
+        try:
+            path.unlink()
+        except OSError:
+            return self.reply(404)
+        self.reply(204)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(root=CACHE_ROOT, host=HOST, port=PORT, verbose=False):
+    """Create (but don't start) a cache server; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), CacheRequestHandler)
+    server.daemon_threads = True
+    server.root = Path(root)
+    server.verbose = verbose
+    return server
+
+
+def start_server(root=CACHE_ROOT, host=HOST, port=0):
+    """
+    Run a cache server in a background thread, e.g. for trying the http
+    backend locally.
+
+    Returns:
+        tuple: (server, base URL); call server.shutdown() to stop it
+    """
+    server = create_server(root, host, port)
+    threading.Thread(target=server.serve_forever, name='cache-server', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    """Serve the remote cache until interrupted"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the shared remote artifact cache")
+    parser.add_argument('--root', default=CACHE_ROOT, help="Directory the entries are stored in")
+    parser.add_argument('--host', default=HOST, help="Address to listen on")
+    parser.add_argument('--port', type=int, default=PORT, help="Port to listen on")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.root, args.host, args.port, args.verbose)
+    print(f"[OK] Serving cache from {args.root} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,442 @@
+import hashlib
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+# WordprocessingML namespaces
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+WP = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}'
+M = '{http://schemas.openxmlformats.org/officeDocument/2006/math}'
+V = '{urn:schemas-microsoft-com:vml}'
+PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+DCTERMS = '{http://purl.org/dc/terms/}'
+
+DOCUMENT_XML = 'word/document.xml'
+# Parts pandoc renders besides the body, each with its own relationships
+NOTE_PARTS = ('word/footnotes.xml', 'word/endnotes.xml')
+CORE_PROPERTIES = 'docProps/core.xml'
+
+# Constructs the fast path cannot reproduce faithfully
+UNSUPPORTED_TAGS = {
+    M + 'oMath': 'OMML math',
+    M + 'oMathPara': 'OMML math',
+    W + 'numPr': 'numbered or bulleted list',
+    W + 'footnoteReference': 'footnote',
+    W + 'endnoteReference': 'endnote',
+    W + 'txbxContent': 'text box',
+    W + 'object': 'embedded object',
+    V + 'imagedata': 'VML image',
+    W + 'gridSpan': 'merged table cells',
+    W + 'vMerge': 'merged table cells',
+    W + 'ins': 'tracked changes',
+    W + 'del': 'tracked changes',
+    W + 'sdt': 'content control',
+}
+
+HEADING_COMMANDS = {
+    'heading1': 'section',
+    'heading2': 'subsection',
+    'heading3': 'subsubsection',
+    'heading4': 'paragraph',
+}
+
+LATEX_ESCAPES = {
+    '\\': '\\textbackslash{}',
+    '&': '\\&',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '_': '\\_',
+    '{': '\\{',
+    '}': '\\}',
+    '~': '\\textasciitilde{}',
+    '^': '\\textasciicircum{}',
+}
+
+# Attributes Word rewrites on save that don't affect the converted output
+VOLATILE_ATTRIBUTES = ('rsid', 'paraId', 'textId')
+# Parts whose content affects how every block converts
+CONTEXT_PARTS = ('word/styles.xml', 'word/numbering.xml', 'word/settings.xml')
+BLOCK_SEPARATOR = 'ZZDOCXBLOCKBOUNDARY{:06d}ZZ'
+
+# Width of the text block used to turn drawing extents into \textwidth fractions
+TEXT_WIDTH_EMU = 5943600  # 6.5in
+
+
+class UnsupportedDocx(Exception):
+    """Raised when the document uses a construct the fast path doesn't handle"""
+
+
+def escape_latex(text):
+    return ''.join(LATEX_ESCAPES.get(char, char) for char in text)
+
+
+def relationships_path(part):
+    """Relationships part of a package part, e.g. word/_rels/document.xml.rels"""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, '_rels', f'{name}.rels')
+
+
+def read_relationships(docx_zip, part=DOCUMENT_XML):
+    """Map relationship ids of a part (word/document.xml by default) to their targets inside the package"""
+    relationships = {}
+    rels_path = relationships_path(part)
+    if rels_path not in docx_zip.namelist():
+        return relationships
+    with docx_zip.open(rels_path) as f:
+        for rel in ET.parse(f).getroot().iter(PKG_REL + 'Relationship'):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = posixpath.normpath(posixpath.join('word', rel.get('Target', '')))
+            relationships[rel.get('Id')] = target
+    return relationships
+
+
+def iter_body_blocks(docx_zip, check_unsupported=False):
+    """
+    Stream the top-level blocks (w:p, w:tbl) of word/document.xml.
+
+    Uses iterparse and clears every block once the caller is done with it,
+    so memory stays bounded by the largest single block, not the document.
+
+    Yields:
+        Element: A complete paragraph or table element
+    """
+    stack = []
+    with docx_zip.open(DOCUMENT_XML) as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if check_unsupported:
+                    if elem.tag in UNSUPPORTED_TAGS:
+                        raise UnsupportedDocx(UNSUPPORTED_TAGS[elem.tag])
+                    if elem.tag == W + 'tbl' and any(tag == W + 'tbl' for tag in stack):
+                        raise UnsupportedDocx('nested table')
+                stack.append(elem.tag)
+                continue
+
+            stack.pop()
+            # stack is now [document, body] for direct children of w:body
+            if len(stack) == 2 and elem.tag in (W + 'p', W + 'tbl'):
+                yield elem
+                elem.clear()
+
+
+def referenced_media(docx_zip):
+    """
+    Package paths of the images the document actually shows in its body,
+    footnotes and endnotes: DrawingML blips (r:embed, or internal r:link)
+    and VML image data (r:id, used for legacy pictures and OLE object
+    previews), resolved through each part's own relationships. Media left
+    behind by deleted figures, videos and SVG twins of blips aren't
+    included.
+
+    Returns:
+        set: Paths such as 'word/media/image1.png'
+    """
+    # Direct children of w:body, and single footnotes/endnotes, are cleared once scanned
+    referenced = part_media(docx_zip, DOCUMENT_XML, clear_depth=2)
+    for part in NOTE_PARTS:
+        if part in docx_zip.namelist():
+            referenced |= part_media(docx_zip, part, clear_depth=1)
+    return referenced
+
+
+def part_media(docx_zip, part, clear_depth):
+    """
+    Media referenced from one XML part. Streams the part and clears every
+    element at clear_depth once it was scanned, like iter_body_blocks, but
+    also covers content controls and other children that aren't paragraphs
+    or tables.
+    """
+    relationships = read_relationships(docx_zip, part)
+    references = {A + 'blip': (R + 'embed', R + 'link'), V + 'imagedata': (R + 'id',)}
+    referenced = set()
+    depth = 0
+    with docx_zip.open(part) as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                for attribute in references.get(elem.tag, ()):
+                    target = relationships.get(elem.get(attribute))
+                    if target and target.startswith('word/media/'):
+                        referenced.add(target)
+                continue
+            depth -= 1
+            if depth == clear_depth:
+                elem.clear()
+    return referenced
+
+
+def paragraph_style(paragraph):
+    style = paragraph.find(f'{W}pPr/{W}pStyle')
+    return style.get(W + 'val', '').lower() if style is not None else ''
+
+
+def run_is_on(run, tag):
+    prop = run.find(f'{W}rPr/{W}{tag}')
+    return prop is not None and prop.get(W + 'val', 'true') not in ('0', 'false', 'off')
+
+
+def paragraph_to_latex(paragraph, relationships):
+    """Convert the runs of a paragraph to LaTeX text"""
+    parts = []
+    for run in paragraph.iter(W + 'r'):
+        text = []
+        for child in run:
+            if child.tag == W + 't':
+                text.append(escape_latex(child.text or ''))
+            elif child.tag == W + 'tab':
+                text.append(' ')
+            elif child.tag in (W + 'br', W + 'cr'):
+                text.append('\\\\\n')
+            elif child.tag == W + 'drawing':
+                text.append(drawing_to_latex(child, relationships))
+        text = ''.join(text)
+        if not text:
+            continue
+        if run_is_on(run, 'b'):
+            text = f'\\textbf{{{text}}}'
+        if run_is_on(run, 'i'):
+            text = f'\\emph{{{text}}}'
+        parts.append(text)
+    return ''.join(parts)
+
+
+def drawing_to_latex(drawing, relationships):
+    blip = next(drawing.iter(A + 'blip'), None)
+    target = relationships.get(blip.get(R + 'embed')) if blip is not None else None
+    if not target:
+        raise UnsupportedDocx('drawing without embedded image')
+
+    options = ''
+    extent = next(drawing.iter(WP + 'extent'), None)
+    if extent is not None and extent.get('cx', '').isdigit():
+        fraction = min(int(extent.get('cx')) / TEXT_WIDTH_EMU, 1.0)
+        options = f'[width={fraction:.2f}\\textwidth]'
+    # Paths are relative to word/, as pandoc's --extract-media writes them
+    return f'\\includegraphics{options}{{{posixpath.relpath(target, "word")}}}'
+
+
+def table_to_latex(table, relationships):
+    """Emit a simple table in the longtable layout pandoc produces"""
+    rows = []
+    for row in table.iter(W + 'tr'):
+        cells = []
+        for cell in row.iter(W + 'tc'):
+            text = ' '.join(paragraph_to_latex(p, relationships) for p in cell.iter(W + 'p'))
+            cells.append(text.strip())
+        rows.append(cells)
+
+    if not rows:
+        return ''
+    ncols = max(len(cells) for cells in rows)
+    lines = [f'\\begin{{longtable}}[]{{@{{}}{"l" * ncols}@{{}}}}', '\\toprule']
+    header, *body = rows
+    lines.append(' & '.join(header + [''] * (ncols - len(header))) + ' \\\\')
+    lines.extend(['\\midrule', '\\endhead'])
+    for cells in body:
+        lines.append(' & '.join(cells + [''] * (ncols - len(cells))) + ' \\\\')
+    lines.extend(['\\bottomrule', '\\end{longtable}'])
+    return '\n'.join(lines)
+
+
+def block_to_latex(block, relationships):
+    """Convert one top-level paragraph or table element to LaTeX"""
+    if block.tag == W + 'tbl':
+        return table_to_latex(block, relationships)
+
+    text = paragraph_to_latex(block, relationships).strip()
+    if not text:
+        return ''
+    style = paragraph_style(block)
+    if style in HEADING_COMMANDS:
+        return f'\\{HEADING_COMMANDS[style]}{{{text}}}'
+    if style == 'title':
+        return f'\\title{{{text}}}\n\\maketitle'
+    return text
+
+
+def docx_to_latex(docx_path, latex_file):
+    """
+    Convert a plain DOCX (paragraphs, headings, simple tables, images) to a
+    LaTeX document without pandoc, writing blocks to latex_file as they are
+    streamed out of the package.
+
+    Raises:
+        UnsupportedDocx: If the document uses a construct this converter
+            doesn't handle; callers should fall back to pandoc.
+    """
+    with zipfile.ZipFile(docx_path, 'r') as docx_zip, \
+         open(latex_file, 'w', encoding='utf-8') as out:
+        relationships = read_relationships(docx_zip)
+        out.write('\\begin{document}\n')
+        for block in iter_body_blocks(docx_zip, check_unsupported=True):
+            latex = block_to_latex(block, relationships)
+            if latex:
+                out.write(f'\n{latex}\n')
+        out.write('\n\\end{document}\n')
+
+
+def read_root_declarations(docx_zip):
+    """Return the namespace declarations and attributes of the w:document root"""
+    namespaces = {}
+    with docx_zip.open(DOCUMENT_XML) as f:
+        for event, item in ET.iterparse(f, events=('start-ns', 'start')):
+            if event == 'start-ns':
+                prefix, uri = item
+                namespaces[prefix] = uri
+            else:
+                return namespaces, dict(item.attrib)
+    return namespaces, {}
+
+
+def modified_timestamp(docx_zip):
+    """
+    Last modification time recorded in the package's core properties, as
+    seconds since the epoch, or None if it has none.
+    """
+    if CORE_PROPERTIES not in docx_zip.namelist():
+        return None
+    with docx_zip.open(CORE_PROPERTIES) as f:
+        modified = ET.parse(f).getroot().find(DCTERMS + 'modified')
+    if modified is None or not (modified.text or '').strip():
+        return None
+    from datetime import datetime, timezone
+
+    try:
+        stamp = datetime.fromisoformat(modified.text.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return max(int(stamp.timestamp()), 0)
+
+
+def is_list_paragraph(block):
+    return block.tag == W + 'p' and block.find(f'{W}pPr/{W}numPr') is not None
+
+
+def iter_revision_blocks(docx_zip):
+    """
+    Stream the body as serialized blocks with content fingerprints.
+
+    A block is a paragraph, a table or a run of consecutive list paragraphs
+    (kept together so list numbering converts the same way). Volatile
+    revision-tracking attributes are dropped before hashing, and the path and
+    content hash of every referenced image are folded into the fingerprint.
+
+    Yields:
+        tuple: (fingerprint, serialized XML of the block)
+    """
+    namespaces, _ = read_root_declarations(docx_zip)
+    for prefix, uri in namespaces.items():
+        try:
+            ET.register_namespace(prefix, uri)
+        except ValueError:
+            pass
+
+    relationships = read_relationships(docx_zip)
+    media_hashes = {}
+    pending = []
+
+    def media_hash(target):
+        if target not in media_hashes:
+            try:
+                media_hashes[target] = hashlib.sha256(docx_zip.read(target)).hexdigest()
+            except KeyError:
+                media_hashes[target] = ''
+        return media_hashes[target]
+
+    def serialize(block):
+        digest = hashlib.sha256()
+        for elem in block.iter():
+            for name in [name for name in elem.attrib if name.split('}')[-1].startswith(VOLATILE_ATTRIBUTES)]:
+                del elem.attrib[name]
+            embed = elem.get(R + 'embed') or elem.get(R + 'id')
+            if embed in relationships:
+                target = relationships[embed]
+                digest.update(f'{target}:{media_hash(target)}'.encode('utf-8'))
+        xml = ET.tostring(block, encoding='unicode')
+        digest.update(xml.encode('utf-8'))
+        return digest, xml
+
+    def flush():
+        digest = hashlib.sha256()
+        for part_digest, _ in pending:
+            digest.update(part_digest.digest())
+        return digest.hexdigest(), ''.join(xml for _, xml in pending)
+
+    for block in iter_body_blocks(docx_zip):
+        serialized = serialize(block)
+        if is_list_paragraph(block):
+            pending.append(serialized)
+            continue
+        if pending:
+            yield flush()
+            pending = []
+        digest, xml = serialized
+        yield digest.hexdigest(), xml
+    if pending:
+        yield flush()
+
+
+def context_fingerprint(docx_zip):
+    """Hash the package parts that affect the conversion of every block"""
+    digest = hashlib.sha256()
+    names = set(docx_zip.namelist())
+    for part in CONTEXT_PARTS:
+        if part in names:
+            digest.update(docx_zip.read(part))
+    return digest.hexdigest()
+
+
+def write_fragment_docx(docx_path, fragment_path, blocks):
+    """
+    Write a copy of the package whose body holds only the given blocks,
+    each followed by a separator paragraph so the converted output can be
+    split back into per-block pieces.
+    """
+    with zipfile.ZipFile(docx_path, 'r') as source:
+        namespaces, root_attrib = read_root_declarations(source)
+        declarations = ' '.join(
+            f'xmlns:{prefix}="{uri}"' if prefix else f'xmlns="{uri}"'
+            for prefix, uri in namespaces.items()
+        )
+        attributes = ' '.join(
+            f'{prefix}:{name.split("}")[-1]}={quoteattr(value)}'
+            for name, value in root_attrib.items()
+            for prefix, uri in namespaces.items()
+            if name.startswith('{') and name[1:].split('}')[0] == uri and prefix
+        )
+        w = next((prefix for prefix, uri in namespaces.items() if '{' + uri + '}' == W), 'w')
+
+        parts = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                 f'<{w}:document {declarations} {attributes}><{w}:body>']
+        for index, xml in enumerate(blocks):
+            parts.append(xml)
+            parts.append(f'<{w}:p><{w}:r><{w}:t>{BLOCK_SEPARATOR.format(index)}</{w}:t></{w}:r></{w}:p>')
+        parts.append(f'</{w}:body></{w}:document>')
+
+        with zipfile.ZipFile(fragment_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                if item.filename == DOCUMENT_XML:
+                    target.writestr(DOCUMENT_XML, ''.join(parts))
+                else:
+                    target.writestr(item, source.read(item.filename))
+
+
+def split_fragment_latex(latex, count):
+    """Split LaTeX converted from a fragment package back into per-block pieces"""
+    pieces = []
+    position = 0
+    for index in range(count):
+        separator = BLOCK_SEPARATOR.format(index)
+        end = latex.find(separator, position)
+        if end == -1:
+            return None
+        pieces.append(latex[position:end].strip())
+        position = end + len(separator)
+    return pieces
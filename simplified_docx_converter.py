@@ -6,8 +6,15 @@ import os
 import re
 import zipfile
 import logging
-import chardet
 import glob
+import hashlib
+import time
+import signal
+import threading
+from collections import deque
+import json
+
+from table_model import TableGrid, parse_and_clean
 
 # Configuration
 DOCX_FILE = "Paper.docx"
@@ -21,17 +28,265 @@ LATEX_TEMPLATE  = "output/corrected.tex"
 OUTPUT_DIR = ""
 TEMP_DIR = "temp_conversion"
 COMPILE_PDF = True
+FAST_PATH = False               # Try the in-process DOCX XML converter before pandoc
+INCREMENTAL = False             # Reuse converted LaTeX of blocks unchanged since the last revision
+REVISION_CACHE_DIR = ".revision_cache"
+REFERENCED_MEDIA_ONLY = True    # Only extract media the document body references (skips orphaned images, videos)
+NORMALIZE_MEDIA = True          # Convert EMF/WMF/TIFF/BMP/GIF media to PDF/PNG for pdflatex
+MAX_WORKERS = os.cpu_count() or 1
+TEMPLATE_REGISTRY = True        # Look templates up in a persistent index instead of re-parsing them
+SPLIT_SECTIONS = False          # Write the body as per-section \include files
+INCLUDEONLY_CHANGED = False     # With SPLIT_SECTIONS, the first pass only typesets changed sections (the final pass is always full)
+DRAFT_BUILD = False             # Only typeset the sections changed since the last build, into a separate draft PDF (see --draft)
+DRAFT_SUFFIX = "-draft"         # Draft PDF name: paper-draft.pdf; paper.pdf is left as it was
+PARALLEL_CHAPTERS = False       # Split at top-level sections and compile them as parallel pdflatex jobs (not with hyperref)
+CHAPTER_BUILD_DIR = "chapter_build"  # Per-chapter job output, relative to the output directory
+SECTIONS_DIR = "sections"
+STAGE_GRAPH = True              # Run convert() as a make-style stage graph, keeping intermediate artifacts
+BUILD_DIR = ".build"            # Per-document working directories and stage stamps of the stage graph
+BUILD_CACHE = True              # Reuse the last PDF when the build inputs are unchanged
+PARALLEL_TABLES = True          # Clean tables in a process pool for table-heavy documents
+PARALLEL_TABLES_MIN = 32        # Below this many tables the pool startup isn't worth it
+PACKAGE_PREFLIGHT = True        # Check template classes/packages with kpsewhich, skip the compile if any are missing
+REQUIRED_PACKAGES = ['graphicx', 'booktabs']  # Added to the template preamble when it doesn't load them
+FONT_PREFLIGHT = True           # Check template fonts with kpsewhich before compiling, substitute missing ones
+TOOL_CONCURRENCY = {             # Concurrent processes per external tool when converting a batch
+    'pandoc': MAX_WORKERS,
+    'pdflatex': MAX_WORKERS,
+}
+VALIDATE_TABLES = False         # Compile each table alone with the template preamble and repair the ones that fail
+AI_TABLE_CORRECTION = False     # Escalate tables the local normalizer can't fix to ai_latex_formatter
+EXTERNALIZE_TABLES = False      # Typeset tables once as cached standalone PDF snippets and include those
+EXTERNAL_DIR = "external"       # Snippet PDFs, relative to the output directory
+CACHE_BACKENDS = ['memory', 'disk']  # Cache tiers, fastest first: 'memory', 'disk', 'sqlite' and/or 'http'
+CACHE_DIR = ".cache"            # Disk/SQLite cache entries and cumulative hit-rate stats (see --cache-stats)
+CACHE_MAX_BYTES = {             # Size limit per backend; least recently used entries are evicted beyond it
+    'memory': 64 << 20,
+    'disk': 2 << 30,
+    'sqlite': 2 << 30,
+}
+CACHE_TTL = {                   # Seconds an entry stays valid per namespace ('*' is the default, None = forever)
+    '*': None,
+    'preflight': 24 * 3600,     # Found packages and fonts; missing ones are looked up again every run
+    'table_checks': 7 * 24 * 3600,  # Standalone table compile results, redone in case the TeX tree changed
+    'snippet_failures': 24 * 3600,  # Tables whose snippet didn't compile, retried after this
+}
+CACHE_COMPRESSION = 'zlib'      # 'zlib', 'lzma' or None for entries in the persistent backends
+CACHE_REMOTE_URL = None         # Shared cache of the 'http' backend, e.g. "http://cache-host:8765" (see cache_server.py)
+CACHE_REMOTE_NAMESPACES = ['pandoc', 'media', 'pdf', 'snippets', 'ai_tables']  # Node-independent artifacts to share
+DETERMINISTIC_BUILD = False     # Byte-identical .tex/.pdf for identical inputs (dates from SOURCE_DATE_EPOCH, no PDF /ID)
+LATEX_TIMEOUT = 120             # Seconds per pdflatex pass
+LATEX_MAX_ERRORS = 20           # Abort a pass once this many errors were reported
+LATEX_FATAL_PATTERNS = [
+    '! Emergency stop',
+    '==> Fatal error occurred',
+    '! TeX capacity exceeded',
+    "! I can't find file",
+    '*** (job aborted',
+]
+
+IMPORT_TIME_BUDGET_MS = 150     # Upper bound for importing this module (see --check-import-time)
+# Heavy dependencies that must only be imported by the stages that use them
+LAZY_IMPORTS = ['chardet', 'requests', 'concurrent.futures', 'multiprocessing', 'asyncio']
+PEAK_MEMORY_FACTOR = 4          # Merge peak memory budget as a multiple of the input size (see --check-peak-memory)
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Magic byte signatures of media formats pdflatex cannot include directly.
+# Each entry maps a format name to the target format it gets converted to.
+INCOMPATIBLE_MEDIA_TARGETS = {
+    'emf': 'pdf',
+    'wmf': 'pdf',
+    'tiff': 'png',
+    'bmp': 'png',
+    'gif': 'png',
+}
+
+
+def detect_media_format(file_path):
+    """Detect pdflatex-incompatible media formats by their magic bytes"""
+    with open(file_path, 'rb') as f:
+        header = f.read(44)
+
+    if header[:4] == b'\x01\x00\x00\x00' and header[40:44] == b' EMF':
+        return 'emf'
+    if header[:4] == b'\xd7\xcd\xc6\x9a' or header[:4] in (b'\x01\x00\x09\x00', b'\x02\x00\x09\x00'):
+        return 'wmf'
+    if header[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    if header[:2] == b'BM':
+        return 'bmp'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    return None
+
+
+def convert_media_file(src_path, dst_path, media_format):
+    """
+    Convert a single media file to a pdflatex-compatible format.
+    Runs in a worker process, so it only takes and returns plain values.
+
+    Returns:
+        str: Path to the converted file or None if no converter succeeded
+    """
+    src_path = str(src_path)
+    dst_path = str(dst_path)
+
+    if INCOMPATIBLE_MEDIA_TARGETS[media_format] == 'pdf':
+        # Vector formats: prefer inkscape, fall back to LibreOffice
+        commands = []
+        if shutil.which('inkscape'):
+            commands.append(['inkscape', src_path, '--export-type=pdf', f'--export-filename={dst_path}'])
+        for office in ('libreoffice', 'soffice'):
+            if shutil.which(office):
+                commands.append([office, '--headless', '--convert-to', 'pdf',
+                                 '--outdir', str(Path(dst_path).parent), src_path])
+                break
+    else:
+        # Raster formats: ImageMagick, first frame only for animated GIFs
+        commands = []
+        for magick in ('magick', 'convert'):
+            if shutil.which(magick):
+                commands.append([magick, f'{src_path}[0]', dst_path])
+                break
+
+    for cmd in commands:
+        try:
+            subprocess.run(cmd, capture_output=True, check=True, timeout=60)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            continue
+
+        # LibreOffice names its output after the source file
+        office_output = Path(dst_path).parent / (Path(src_path).stem + '.pdf')
+        if not Path(dst_path).exists() and office_output.exists():
+            office_output.replace(dst_path)
+
+        if Path(dst_path).exists():
+            return dst_path
+
+    return None
+
+PDFLATEX_ARGS = ['pdflatex', '-interaction=nonstopmode', '-file-line-error']
+FRONT_MATTER_SECTION = "section_000"
+CHECKPOINT_PATTERN = re.compile(r'(\\@setckpt\{[^}]*\}\{)(.*)\}', re.DOTALL)
+CHECKPOINT_COUNTER_PATTERN = re.compile(r'\\setcounter\{([^}]*)\}\{(-?\d+)\}')
+PAGES_WRITTEN_PATTERN = re.compile(r'Output written on .*?\((\d+) pages?')
+# Table snippets are cropped to their content by the preview package
+SNIPPET_PREAMBLE = "\\usepackage[active,tightpage]{preview}"
+# A command of its own, so the image pass leaves snippet includes alone (the
+# space after \includegraphics keeps the pass off the definition as well)
+SNIPPET_INCLUDE_COMMAND = "\\providecommand{\\externalsnippet}[1]{\\includegraphics {#1}}"
+SNIPPET_SKIP_PATTERN = re.compile(r'\\(?:includegraphics|ref|eqref|pageref|autoref|cref|label|cite\w*|footnote)\b')
+# pdfTeX settings of deterministic builds: no trailer /ID and no PTEX.* keys
+# (which record file paths); dates come from SOURCE_DATE_EPOCH instead
+DETERMINISTIC_PREAMBLE = (
+    "\\ifdefined\\pdftrailerid\\pdftrailerid{}\\fi\n"
+    "\\ifdefined\\pdfsuppressptexinfo\\pdfsuppressptexinfo=-1\\fi"
+)
+# LaTeX byproducts that legitimately differ between runs (timestamps, paths)
+REPRODUCIBLE_SKIP_SUFFIXES = {'.log', '.stdout', '.aux', '.out', '.toc', '.lof', '.lot', '.fls'}
+# Settings main() overrides from the command line; worker processes get them through init_worker
+CLI_SETTINGS = ('COMPILE_PDF', 'DETERMINISTIC_BUILD', 'CACHE_BACKENDS', 'CACHE_REMOTE_URL',
+                'DRAFT_BUILD', 'SPLIT_SECTIONS')
+
+def cli_settings():
+    """Current values of the CLI_SETTINGS, to hand to init_worker"""
+    return {name: globals()[name] for name in CLI_SETTINGS}
+
+def init_worker(settings):
+    """
+    Initializer for worker processes: apply the parent's command line
+    settings (spawned and forkserver workers re-import this module with its
+    defaults) and drop any cache manager inherited from the parent.
+    """
+    from cache_manager import reset_shared_cache
+    globals().update(settings)
+    reset_shared_cache()
+
+def get_cache():
+    """The process-wide cache manager, configured from the CACHE_* settings"""
+    from cache_manager import shared_cache
+    return shared_cache(backends=CACHE_BACKENDS, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES,
+                        ttl=CACHE_TTL, compression=CACHE_COMPRESSION, remote_url=CACHE_REMOTE_URL,
+                        remote_namespaces=CACHE_REMOTE_NAMESPACES)
+
+def latex_environment(source_date_epoch=None):
+    """Environment for pdflatex runs (None keeps the current one)"""
+    overrides = {}
+    if FONT_PREFLIGHT:
+        # Fonts were checked up front, never block a pass on bitmap font generation
+        overrides.update(MKTEXPK='0', MKTEXTFM='0')
+    if DETERMINISTIC_BUILD and source_date_epoch is not None:
+        # pdfTeX takes the PDF dates and, forced, \today and \time from it
+        overrides.update(SOURCE_DATE_EPOCH=str(source_date_epoch), FORCE_SOURCE_DATE='1')
+    return dict(os.environ, **overrides) if overrides else None
+
+def kill_process_group(process):
+    """Kill a process started in its own session, including helpers such as mktexpk"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+class LatexOutputMonitor:
+    """
+    Parses pdflatex output as it streams in and decides when a pass should
+    be aborted: on one of LATEX_FATAL_PATTERNS or once LATEX_MAX_ERRORS
+    errors were reported.
+    """
+    error_keywords = ['error', 'undefined', 'missing', 'emergency stop']
+    error_line_pattern = re.compile(r'^(?:! |\S+:\d+: )')
+
+    def __init__(self):
+        self.error_lines = []
+        self.error_count = 0
+        self.tail = deque(maxlen=40)
+        self.aborted = None
+
+    def feed(self, line):
+        """Record one line of output, return the abort reason if the pass should stop"""
+        self.tail.append(line)
+        if any(keyword in line.lower() for keyword in self.error_keywords):
+            self.error_lines.append(line)
+        if self.error_line_pattern.match(line):
+            self.error_count += 1
+
+        fatal = next((pattern for pattern in LATEX_FATAL_PATTERNS if pattern in line), None)
+        if fatal:
+            self.aborted = f"fatal error '{fatal}'"
+        elif self.error_count >= LATEX_MAX_ERRORS:
+            self.aborted = f"{self.error_count} errors reported"
+        return self.aborted
+
+    def result(self, returncode):
+        return {
+            'returncode': returncode if not self.aborted else (returncode or 1),
+            'error_lines': self.error_lines,
+            'tail': ''.join(self.tail),
+            'aborted': self.aborted,
+        }
+
 class SimplifiedDOCXConverter:
     def __init__(self, docx_path, template_path, output_dir):
         self.docx_path = Path(docx_path)
         self.template_path = Path(template_path)
         self.output_dir = Path(output_dir)
         self.temp_dir = Path(TEMP_DIR)
+        self.media_map = {}  # original image name -> normalized image name
+        self.tool_versions = {}  # tool name -> first line of its --version output
+        self.column_layout = 'onecolumn'
+        self.table_results = {}  # raw table -> (column count, cleaned table)
+        self.template_info = None  # template registry entry, loaded on first use
+        self.build_epoch = None  # timestamp of deterministic builds, read on first use
+        self.table_hashes = {}  # sha256 of raw table -> (column count, cleaned table), persisted across revisions
+        self.table_snippets = {}  # raw table -> \externalsnippet include of its PDF snippet
+        self.draft_build = False  # split document whose first pass may skip unchanged sections
+        self.missing_fonts = []  # [family, encoding] pairs the font pre-flight couldn't find
+        self.passes = []  # post-processing passes, in registration order
+        self.register_default_passes()
     
     @staticmethod
     def find_cls_file(template_directory):
@@ -54,6 +309,23 @@ class SimplifiedDOCXConverter:
         # Return the first .cls file found
         return cls_files[0] if cls_files else None
 
+    def get_template_info(self):
+        """
+        Template metadata (preamble, layout, cls path, packages, hashes) from
+        the persistent template registry, or None if the registry is disabled.
+        """
+        if self.template_info is None and TEMPLATE_REGISTRY:
+            from template_registry import TemplateRegistry
+            self.template_info = TemplateRegistry(cache=get_cache()).lookup(self.template_path)
+        return self.template_info
+
+    def template_cls_file(self):
+        """Path of the template's .cls file, from the registry when available"""
+        template_info = self.get_template_info()
+        if template_info:
+            return template_info['cls_path']
+        return self.find_cls_file(str(self.template_path.parent))
+
     def check_dependencies(self):
         """Check if required tools are installed"""
         required_tools = {
@@ -64,7 +336,8 @@ class SimplifiedDOCXConverter:
         missing = []
         for tool, cmd in required_tools.items():
             try:
-                subprocess.run(cmd.split(), capture_output=True, check=True)
+                result = subprocess.run(cmd.split(), capture_output=True, text=True, check=True)
+                self.tool_versions[tool] = result.stdout.split('\n', 1)[0].strip()
                 print(f"[OK] {tool} found")
             except (subprocess.CalledProcessError, FileNotFoundError):
                 missing.append(tool)
@@ -76,13 +349,32 @@ class SimplifiedDOCXConverter:
         return True
     
     def extract_images_from_docx(self):
-        """Extract images from DOCX file"""
+        """
+        Extract images from DOCX file.
+
+        With REFERENCED_MEDIA_ONLY only the word/media entries the body
+        references through document.xml.rels are written, so orphaned
+        images, embedded videos and the like cost no I/O.
+        """
         images_dir = self.temp_dir / "images"
+        # Start empty, so images of an earlier revision don't end up in the output
+        shutil.rmtree(images_dir, ignore_errors=True)
         images_dir.mkdir(parents=True, exist_ok=True)
         
         try:
             with zipfile.ZipFile(self.docx_path, 'r') as docx_zip:
                 media_files = [f for f in docx_zip.namelist() if f.startswith('word/media/')]
+                skipped = 0
+                if REFERENCED_MEDIA_ONLY and media_files:
+                    import docx_xml
+
+                    try:
+                        referenced = docx_xml.referenced_media(docx_zip)
+                    except (KeyError, docx_xml.ET.ParseError) as e:
+                        print(f"[WARNING] Could not read media references, extracting all media: {e}")
+                    else:
+                        skipped = sum(1 for f in media_files if f not in referenced)
+                        media_files = [f for f in media_files if f in referenced]
                 
                 for media_file in media_files:
                     filename = Path(media_file).name
@@ -90,21 +382,110 @@ class SimplifiedDOCXConverter:
                          open(images_dir / filename, 'wb') as target:
                         shutil.copyfileobj(source, target)
                 
-                print(f"[OK] Extracted {len(media_files)} media files")
-                return list(images_dir.glob("*"))
+                if skipped:
+                    print(f"[OK] Extracted {len(media_files)} media files, skipped {skipped} unreferenced")
+                else:
+                    print(f"[OK] Extracted {len(media_files)} media files")
+                return sorted(images_dir.glob("*"))
                 
         except Exception as e:
             print(f"[WARNING] Could not extract images: {e}")
             return []
+
+    def source_date_epoch(self):
+        """
+        Timestamp of deterministic builds: SOURCE_DATE_EPOCH if it is set,
+        else the DOCX's last modification in its core properties, else 0.
+        """
+        if self.build_epoch is None:
+            epoch = os.environ.get('SOURCE_DATE_EPOCH', '').strip()
+            if epoch.isdigit():
+                self.build_epoch = int(epoch)
+            else:
+                import docx_xml
+
+                try:
+                    with zipfile.ZipFile(self.docx_path, 'r') as docx_zip:
+                        self.build_epoch = docx_xml.modified_timestamp(docx_zip) or 0
+                except (OSError, zipfile.BadZipFile, docx_xml.ET.ParseError):
+                    self.build_epoch = 0
+        return self.build_epoch
+
+    @staticmethod
+    def file_sha256(file_path):
+        """Return the SHA-256 hex digest of a file's contents"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def normalize_media(self, image_files):
+        """
+        Convert media pdflatex cannot include (EMF/WMF/TIFF/BMP/GIF) to PDF/PNG.
+
+        Formats are detected by magic bytes, conversions run in a process pool
+        and results are cached by content hash in the 'media' cache namespace
+        so that revisions of the same document don't redo the work.
+
+        Args:
+            image_files (list): Paths of the extracted media files
+
+        Returns:
+            dict: Mapping of original image name to converted image name
+        """
+        if not NORMALIZE_MEDIA:
+            return self.media_map
+
+        cache = get_cache()
+        pending = {}
+
+        for image_file in image_files:
+            media_format = detect_media_format(image_file)
+            if not media_format:
+                continue
+
+            target_ext = INCOMPATIBLE_MEDIA_TARGETS[media_format]
+            cache_key = f"{self.file_sha256(image_file)}.{target_ext}"
+            output_file = image_file.with_suffix(f".{target_ext}")
+
+            if cache.get_file('media', cache_key, output_file):
+                self.media_map[image_file.name] = output_file.name
+                print(f"  [OK] {image_file.name} -> {output_file.name} (cached)")
+            else:
+                pending[image_file] = (cache_key, output_file, media_format)
+
+        if not pending:
+            return self.media_map
+
+        from concurrent.futures import ProcessPoolExecutor
+        print(f"Converting {len(pending)} incompatible media files...")
+
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(pending)),
+                                 initializer=init_worker, initargs=(cli_settings(),)) as pool:
+            futures = {
+                image_file: pool.submit(convert_media_file, image_file, output_file, media_format)
+                for image_file, (_, output_file, media_format) in pending.items()
+            }
+            for image_file, future in futures.items():
+                cache_key, output_file, media_format = pending[image_file]
+                try:
+                    converted = future.result()
+                except Exception as e:
+                    converted = None
+                    print(f"  [WARNING] Converting {image_file.name} failed: {e}")
+
+                if converted:
+                    cache.put_file('media', cache_key, output_file, compress=False)
+                    self.media_map[image_file.name] = output_file.name
+                    print(f"  [OK] {image_file.name} -> {output_file.name}")
+                else:
+                    print(f"  [WARNING] No converter available for {media_format.upper()} file {image_file.name}")
+
+        return self.media_map
     
-    def convert_docx_to_latex(self):
-        """Step 1: Convert DOCX to LaTeX using pandoc"""
-        print("Step 1: Converting DOCX to LaTeX...")
-        
-        if not self.docx_path.exists():
-            print(f"[ERROR] Input file not found: {self.docx_path}")
-            return None
-        
+    def pandoc_command(self):
+        """Pandoc command line for the DOCX to LaTeX conversion and the file it writes"""
         latex_file = self.temp_dir / "converted.tex"
         
         pandoc_cmd = [
@@ -115,9 +496,31 @@ class SimplifiedDOCXConverter:
             '--standalone',  # Include full document structure
             '--extract-media', str(self.temp_dir),
         ]
+        return pandoc_cmd, latex_file
+
+    def pandoc_cache_key(self):
+        """Cache key of the pandoc output: DOCX content, pandoc version and options"""
+        pandoc_cmd, _ = self.pandoc_command()
+        options = [arg for arg in pandoc_cmd[1:] if arg.startswith('--') and arg != '--extract-media']
+        return '\0'.join([self.file_sha256(self.docx_path), self.get_tool_version('pandoc'), *options])
+
+    def convert_docx_to_latex(self):
+        """Step 1: Convert DOCX to LaTeX using pandoc"""
+        print("Step 1: Converting DOCX to LaTeX...")
+        
+        if not self.docx_path.exists():
+            print(f"[ERROR] Input file not found: {self.docx_path}")
+            return None
+        
+        pandoc_cmd, latex_file = self.pandoc_command()
+        cache_key = self.pandoc_cache_key()
+        if get_cache().get_file('pandoc', cache_key, latex_file):
+            print("[OK] DOCX converted to LaTeX (cached pandoc output)")
+            return latex_file
         
         try:
             result = subprocess.run(pandoc_cmd, capture_output=True, text=True, check=True)
+            get_cache().put_file('pandoc', cache_key, latex_file)
             print("[OK] DOCX converted to LaTeX")
             return latex_file
         except subprocess.CalledProcessError as e:
@@ -127,6 +530,133 @@ class SimplifiedDOCXConverter:
             print("[ERROR] Pandoc not found. Please install pandoc first.")
             return None
 
+    def convert_docx_incremental(self):
+        """
+        Step 1 (revision-aware): Convert only the blocks that changed since a
+        previous revision of the document.
+
+        The body is fingerprinted per block (paragraph, table or list run).
+        Blocks found in REVISION_CACHE_DIR reuse their cached LaTeX; the rest
+        are written into one fragment DOCX, converted with a single pandoc
+        run and split back per block. Cleaned tables are cached as well, so
+        post-processing only redoes the changed ones.
+        """
+        print("Step 1: Converting DOCX to LaTeX (incremental)...")
+        import docx_xml
+
+        latex_file = self.temp_dir / "converted.tex"
+        fragment_docx = self.temp_dir / "changed_blocks.docx"
+        fragment_latex = self.temp_dir / "changed_blocks.tex"
+
+        try:
+            with zipfile.ZipFile(self.docx_path, 'r') as docx_zip:
+                context = docx_xml.context_fingerprint(docx_zip)
+                blocks = list(docx_xml.iter_revision_blocks(docx_zip))
+        except (zipfile.BadZipFile, KeyError, docx_xml.ET.ParseError) as e:
+            print(f"[WARNING] Could not fingerprint document blocks ({e}), converting in full")
+            return None
+
+        # Styles and numbering affect every block, so they key the whole cache
+        blocks_dir = Path(REVISION_CACHE_DIR) / context[:16]
+        blocks_dir.mkdir(parents=True, exist_ok=True)
+
+        changed = {}
+        for fingerprint, xml in blocks:
+            if not (blocks_dir / f"{fingerprint}.tex").exists():
+                changed.setdefault(fingerprint, xml)
+
+        print(f"[OK] {len(blocks)} blocks, {len(changed)} changed since the cached revision")
+
+        if changed:
+            docx_xml.write_fragment_docx(self.docx_path, fragment_docx, list(changed.values()))
+            pandoc_cmd = [
+                'pandoc',
+                str(fragment_docx),
+                '-o', str(fragment_latex),
+                '--to=latex',
+                '--extract-media', str(self.temp_dir),
+            ]
+            try:
+                subprocess.run(pandoc_cmd, capture_output=True, text=True, check=True)
+            except subprocess.CalledProcessError as e:
+                print(f"[ERROR] Pandoc conversion of changed blocks failed: {e.stderr}")
+                return None
+            except FileNotFoundError:
+                print("[ERROR] Pandoc not found. Please install pandoc first.")
+                return None
+
+            with open(fragment_latex, 'r', encoding='utf-8') as f:
+                pieces = docx_xml.split_fragment_latex(f.read(), len(changed))
+            if pieces is None:
+                print("[WARNING] Could not split converted blocks, converting in full")
+                return None
+
+            for fingerprint, piece in zip(changed, pieces):
+                with open(blocks_dir / f"{fingerprint}.tex", 'w', encoding='utf-8') as f:
+                    f.write(piece)
+
+        with open(latex_file, 'w', encoding='utf-8') as out:
+            out.write("\\begin{document}\n")
+            for fingerprint, _ in blocks:
+                with open(blocks_dir / f"{fingerprint}.tex", 'r', encoding='utf-8') as f:
+                    piece = f.read()
+                if piece:
+                    out.write(f"\n{piece}\n")
+            out.write("\n\\end{document}\n")
+
+        self.load_table_cache()
+        print("[OK] DOCX converted to LaTeX incrementally")
+        return latex_file
+
+    def load_table_cache(self):
+        """Load cleaned tables from previous revisions into self.table_results"""
+        cache_file = Path(REVISION_CACHE_DIR) / "tables.json"
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                for table_hash, result in json.load(f).items():
+                    self.table_hashes[table_hash] = tuple(result)
+        except (OSError, ValueError):
+            pass
+
+    def save_table_cache(self):
+        """Persist the cleaned tables of this revision for the next one"""
+        cache_file = Path(REVISION_CACHE_DIR) / "tables.json"
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self.table_hashes = {
+            hashlib.sha256(table.encode('utf-8')).hexdigest(): result
+            for table, result in self.table_results.items()
+        }
+        # Written atomically, multi-template workers may save concurrently
+        temp_file = cache_file.with_name(f"tables.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.table_hashes, f)
+        os.replace(temp_file, cache_file)
+
+    def convert_docx_fast(self):
+        """
+        Step 1 (fast path): Convert simple DOCX files to LaTeX without pandoc.
+
+        Streams word/document.xml out of the package. Returns None when the
+        document uses constructs the fast path doesn't support (OMML math,
+        lists, footnotes, merged cells, ...), so the caller can fall back to
+        convert_docx_to_latex.
+        """
+        print("Step 1: Converting DOCX to LaTeX (fast path)...")
+        import docx_xml
+
+        latex_file = self.temp_dir / "converted.tex"
+        try:
+            docx_xml.docx_to_latex(self.docx_path, latex_file)
+        except docx_xml.UnsupportedDocx as e:
+            print(f"[OK] Fast path does not support {e}, falling back to pandoc")
+            return None
+        except (zipfile.BadZipFile, KeyError, docx_xml.ET.ParseError) as e:
+            print(f"[WARNING] Fast path failed ({e}), falling back to pandoc")
+            return None
+
+        print("[OK] DOCX converted to LaTeX without pandoc")
+        return latex_file
+
     def extract_preamble_from_template(self):
         """Step 2: Extract everything before \begin{document} from template"""
         print("Step 2: Extracting preamble from template...")
@@ -135,6 +665,12 @@ class SimplifiedDOCXConverter:
             print(f"[ERROR] Template file {self.template_path} not found!")
             return ""
         
+        template_info = self.get_template_info()
+        if template_info:
+            preamble = template_info['preamble']
+            print(f"[OK] Extracted preamble ({len(preamble)} characters) from template registry")
+            return preamble
+        
         # Try multiple encodings to read the template file
         encodings_to_try = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
         
@@ -166,9 +702,75 @@ class SimplifiedDOCXConverter:
             print("[WARNING] \\begin{document} not found in template")
             return template_content.strip()
     
+    def read_cls_content(self):
+        """Text of the template's .cls file, or an empty string if it has none"""
+        cls_file = self.template_cls_file()
+        if not cls_file:
+            return ""
+        with open(cls_file, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+    def preflight_packages(self, template_preamble):
+        """
+        Step 2a: Check that the template's class and packages are installed.
+
+        The whole \\usepackage/\\RequirePackage set (plus REQUIRED_PACKAGES)
+        is resolved in one batched kpsewhich lookup, cached per template and
+        toolchain, so a missing package is reported before any pdflatex pass.
+
+        Returns:
+            list: Missing .sty/.cls file names (empty if all are available)
+        """
+        if not PACKAGE_PREFLIGHT:
+            return []
+        from tex_preflight import check_packages
+
+        search_dirs = [str(self.template_path.parent), str(self.output_dir)]
+        result = check_packages(template_preamble, self.read_cls_content(), REQUIRED_PACKAGES, search_dirs,
+                                cache=get_cache())
+        if not result['checked']:
+            print("[WARNING] kpsewhich not found, skipping package pre-flight check")
+        elif result['missing']:
+            print(f"[ERROR] Missing LaTeX packages: {', '.join(result['missing'])}")
+            print(f"Install them first, e.g. find the providing package with: tlmgr search --global --file {result['missing'][0]}")
+        else:
+            print(f"[OK] All {len(result['files'])} template classes and packages available")
+        return result['missing']
+
+    def preflight_fonts(self, template_preamble):
+        """
+        Step 2b: Check that the fonts the template selects are installed.
+
+        All font files are resolved in one batched kpsewhich lookup, cached
+        per template and toolchain. Missing families are substituted with
+        Latin Modern (Type 1) so pdflatex never falls back to generating
+        bitmap fonts with mktexpk.
+
+        Returns:
+            str: Font substitution declarations to append to the preamble
+        """
+        if not FONT_PREFLIGHT:
+            return ""
+        from tex_preflight import check_fonts
+
+        result = check_fonts(template_preamble, self.read_cls_content(), cache=get_cache())
+        self.missing_fonts = result['missing']
+        if not result['checked']:
+            print("[WARNING] kpsewhich not found, skipping font pre-flight check")
+        elif result['missing']:
+            missing = ', '.join(f"{family} ({encoding})" for family, encoding in result['missing'])
+            print(f"[WARNING] Template fonts not installed: {missing}")
+            if result['substitutions']:
+                print("[OK] Substituting Latin Modern for the missing fonts")
+        elif result['families']:
+            print(f"[OK] All template fonts available: {', '.join(result['families'])}")
+        return result['substitutions']
+
     @staticmethod
     def detect_encoding(file_path):
         """Detect file encoding with better error handling"""
+        import chardet
+
         try:
             with open(file_path, 'rb') as f:
                 raw_data = f.read()
@@ -190,6 +792,12 @@ class SimplifiedDOCXConverter:
         """
         Comprehensive detection with auto-encoding detection
         """
+        template_info = self.get_template_info()
+        if template_info:
+            if template_info['cls_path']:
+                print(f"Found the cls file: {template_info['cls_path']}")
+            return template_info['layout']
+
         # Get the template directory
         template_directory = str(self.template_path.parent)
         
@@ -267,51 +875,48 @@ class SimplifiedDOCXConverter:
                 'figure_env': 'figure'                    # Regular figure environment
             }
 
-    def process_images_optimally(self, content, column_layout):
-        """Process images with optimal sizing based on layout"""
+    def replace_image(self, match):
+        """Rewrite one \\includegraphics command with optimal sizing for self.column_layout"""
+        column_layout = self.column_layout
         image_settings = self.get_optimal_image_settings(column_layout)
+
+        original_options = match.group(1) or ''
+        image_path = match.group(2)
+        image_name = Path(image_path).name
+        image_name = self.media_map.get(image_name, image_name)
         
-        def replace_image(match):
-            original_options = match.group(1) or ''
-            image_path = match.group(2)
-            image_name = Path(image_path).name
-            
-            if 'width=' in original_options:
-                # Extract width value to determine size category
-                width_match = re.search(r'width=([0-9.]+)', original_options)
-                if width_match:
-                    width_val = float(width_match.group(1))
-                    if width_val <= 0.4:
-                        size_category = 'small'
-                    elif width_val <= 0.7:
-                        size_category = 'medium'
-                    else:
-                        size_category = 'large'
-                else:
+        if 'width=' in original_options:
+            # Extract width value to determine size category
+            width_match = re.search(r'width=([0-9.]+)', original_options)
+            if width_match:
+                width_val = float(width_match.group(1))
+                if width_val <= 0.4:
+                    size_category = 'small'
+                elif width_val <= 0.7:
                     size_category = 'medium'
+                else:
+                    size_category = 'large'
             else:
-                # Default to medium if no width specified
                 size_category = 'medium'
-            
-            # Get optimal settings for this size category
-            optimal_width = image_settings[size_category]
-            
-            if column_layout == "twocolumn" and size_category == 'large':
-                return (f'\\begin{{{image_settings["figure_env"]}}}[htbp]\n'
-                       f'\\centering\n'
-                       f'\\includegraphics{optimal_width}{{images/{image_name}}}\n'
-                       f'\\end{{{image_settings["figure_env"]}}}')
-            else:
-                return f'\\includegraphics{optimal_width}{{images/{image_name}}}'
+        else:
+            # Default to medium if no width specified
+            size_category = 'medium'
         
-        # Replace all includegraphics commands
-        processed_content = re.sub(
-            r'\\includegraphics(\[[^\]]*\])?\{([^}]+)\}',
-            replace_image,
-            content
-        )
+        # Get optimal settings for this size category
+        optimal_width = image_settings[size_category]
         
-        return processed_content
+        if column_layout == "twocolumn" and size_category == 'large':
+            return (f'\\begin{{{image_settings["figure_env"]}}}[htbp]\n'
+                   f'\\centering\n'
+                   f'\\includegraphics{optimal_width}{{images/{image_name}}}\n'
+                   f'\\end{{{image_settings["figure_env"]}}}')
+        else:
+            return f'\\includegraphics{optimal_width}{{images/{image_name}}}'
+
+    def process_images_optimally(self, content, column_layout):
+        """Process images with optimal sizing based on layout (the image pass on its own)"""
+        self.column_layout = column_layout
+        return self.run_passes(content, self.passes_for(self.replace_image))
 
     def is_algorithm_table(self, table_content):
         """Check if this is an algorithm table that should be skipped"""
@@ -514,66 +1119,371 @@ class SimplifiedDOCXConverter:
 
     
 
+    def cached_table_result(self, table_str):
+        """Return (column count, cleaned table) if this table was cleaned before"""
+        if table_str not in self.table_results and self.table_hashes:
+            table_hash = hashlib.sha256(table_str.encode('utf-8')).hexdigest()
+            if table_hash in self.table_hashes:
+                self.table_results[table_str] = self.table_hashes[table_hash]
+        return self.table_results.get(table_str)
+
+    def clean_latex_table(self, table_str):
+        cached = self.cached_table_result(table_str)
+        if cached:
+            ncol, cleaned = cached
+        else:
+            ncol, cleaned = parse_and_clean(table_str)
+            self.table_results[table_str] = (ncol, cleaned)
+        print(f'Found columns are {ncol}')
+        return cleaned
+
+    def find_tables(self, content):
+        """Distinct raw tables the table passes will replace, in document order"""
+        table_passes = self.passes_for(self.replace_table)
+        if not table_passes:
+            return []
+        combined = re.compile('|'.join(p['pattern'].pattern for p in table_passes), re.DOTALL)
+        return list(dict.fromkeys(m.group(0) for m in combined.finditer(content)))
+
+    def standalone_setup_hash(self, template_preamble):
+        """
+        Hash of what besides the table decides whether a standalone table
+        document compiles: the preamble, the template's .cls file and the
+        TeX toolchain.
+        """
+        from tex_preflight import toolchain_version
+
+        cls_file = self.template_cls_file()
+        parts = [template_preamble, self.file_sha256(cls_file) if cls_file else '',
+                 toolchain_version(), self.get_tool_version('pdflatex')]
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def compile_standalone(self, body, template_preamble, work_dir, preamble_extra="", draft=False):
+        """
+        Compile body alone in a minimal document with the template preamble.
+
+        Returns:
+            bool: True if pdflatex succeeded (work_dir/snippet.pdf exists unless draft)
+        """
+        work_dir.mkdir(parents=True, exist_ok=True)
+        with open(work_dir / "snippet.tex", 'w', encoding='utf-8') as f:
+            f.write(template_preamble)
+            f.write(f"\n{preamble_extra}\n")
+            f.write("\\begin{document}\n")
+            f.write(body)
+            f.write("\n\\end{document}\n")
+
+        env = dict(latex_environment(self.source_date_epoch()) or os.environ)
+        # Let pdflatex find the template's class and style files
+        env['TEXINPUTS'] = str(self.template_path.resolve().parent) + os.pathsep + env.get('TEXINPUTS', '')
+        options = ['-draftmode'] if draft else []
+        try:
+            result = subprocess.run(PDFLATEX_ARGS + options + ['-halt-on-error', 'snippet.tex'],
+                                    cwd=work_dir, env=env, capture_output=True, stdin=subprocess.DEVNULL,
+                                    timeout=LATEX_TIMEOUT)
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    def table_compiles(self, table_latex, template_preamble, work_dir):
+        """
+        Compile a table alone in a minimal document with the template preamble.
+        Images are replaced by boxes: only the table's LaTeX is under test.
+        """
+        image_stub = "\\AtBeginDocument{\\renewcommand{\\includegraphics}[2][]{\\rule{1em}{1em}}}"
+        return self.compile_standalone(table_latex, template_preamble, work_dir, image_stub, draft=True)
+
+    def repair_table(self, cleaned, template_preamble, work_dir):
+        """
+        Check one cleaned table and escalate if it doesn't compile: first the
+        local normalizer, then (with AI_TABLE_CORRECTION) ai_latex_formatter.
+
+        Returns:
+            dict: 'ok' (the table that will be used compiles) and 'fixed'
+                  (replacement LaTeX or None)
+        """
+        if self.table_compiles(cleaned, template_preamble, work_dir):
+            return {'ok': True, 'fixed': None}
+
+        normalized = TableGrid.parse(cleaned).normalize()
+        if normalized != cleaned and self.table_compiles(normalized, template_preamble, work_dir):
+            return {'ok': True, 'fixed': normalized}
+
+        if AI_TABLE_CORRECTION:
+            from ai_latex_formatter import get_corrected_table_from_api
+            corrected = get_corrected_table_from_api(cleaned, cache=get_cache())
+            if corrected != cleaned and self.table_compiles(corrected, template_preamble, work_dir):
+                return {'ok': True, 'fixed': corrected}
+
+        return {'ok': False, 'fixed': None}
+
+    def validate_tables(self, content, template_preamble):
+        """
+        Compile every table in isolation, in parallel, and replace the ones
+        that fail with a repaired version so the full compile doesn't break.
+
+        Results are cached in the 'table_checks' namespace by the hash of the
+        cleaned table, the preamble, the .cls file and the toolchain, so only
+        new or changed tables are compiled.
+        """
+        if not VALIDATE_TABLES:
+            return
+        tables = self.find_tables(content)
+        if not tables:
+            return
+
+        cleaned_tables = {}
+        for table in tables:
+            cached = self.cached_table_result(table)
+            if not cached:
+                cached = self.table_results[table] = parse_and_clean(table)
+            cleaned_tables[table] = cached[1]
+
+        setup_hash = self.standalone_setup_hash(template_preamble)
+        keys = {
+            table: hashlib.sha256(f"{setup_hash}\0{AI_TABLE_CORRECTION}\0{cleaned}".encode('utf-8')).hexdigest()
+            for table, cleaned in cleaned_tables.items()
+        }
+        cache = get_cache()
+        checks = {}
+        for key in set(keys.values()):
+            check = cache.get_json('table_checks', key)
+            if check is not None:
+                checks[key] = check
+
+        pending = {key: cleaned_tables[table] for table, key in keys.items() if key not in checks}
+        if pending:
+            check_dir = self.temp_dir / "table_checks"
+            # Per setup: template workers of convert_for_templates share the temp directory
+            if not self.table_compiles("", template_preamble, check_dir / f"baseline_{setup_hash[:16]}"):
+                print("[WARNING] Template preamble doesn't compile on its own, skipping table validation")
+                return
+
+            from concurrent.futures import ThreadPoolExecutor
+
+            print(f"Validating {len(pending)} tables in standalone documents...")
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as pool:
+                futures = {
+                    key: pool.submit(self.repair_table, cleaned, template_preamble, check_dir / key[:16])
+                    for key, cleaned in pending.items()
+                }
+                for key, future in futures.items():
+                    checks[key] = future.result()
+                    cache.put_json('table_checks', key, checks[key])
+
+        repaired = failed = 0
+        for table, key in keys.items():
+            check = checks[key]
+            if check['fixed']:
+                ncol, _ = self.table_results[table]
+                self.table_results[table] = (ncol, check['fixed'])
+                repaired += 1
+            elif not check['ok']:
+                failed += 1
+        print(f"[OK] {len(tables)} tables validated, {repaired} repaired")
+        if failed:
+            print(f"[WARNING] {failed} tables still don't compile on their own")
+
+    def compile_snippet(self, table_latex, template_preamble, work_dir, key):
+        """Typeset one table as a tightly cropped PDF and cache it under key"""
+        snippet = f"\\begin{{preview}}\n{table_latex}\n\\end{{preview}}"
+        if not self.compile_standalone(snippet, template_preamble, work_dir, SNIPPET_PREAMBLE):
+            # Remembered, so a table that can't be externalized isn't retried on every build
+            get_cache().put('snippet_failures', key, b'')
+            return False
+        get_cache().put_file('snippets', key, work_dir / "snippet.pdf", compress=False)
+        return True
+
+    def externalize_tables(self, content, template_preamble):
+        """
+        Replace tables by standalone PDF snippets included with \\externalsnippet.
+
+        Each tabular is typeset once in a worker pool, cached in the
+        'snippets' namespace by the hash of the cleaned table, the preamble,
+        the .cls file and the toolchain, and written to EXTERNAL_DIR in the output directory, so unchanged
+        tables cost nothing on rebuilds. Longtables (which break across
+        pages) and tables with images, references, citations or footnotes
+        stay inline, as does any table whose snippet doesn't compile.
+        """
+        if not EXTERNALIZE_TABLES:
+            return
+        setup_hash = self.standalone_setup_hash(template_preamble)
+        candidates = {}
+        for table in self.find_tables(content):
+            cached = self.cached_table_result(table)
+            if not cached:
+                cached = self.table_results[table] = parse_and_clean(table)
+            cleaned = cached[1]
+            if not cleaned.lstrip().startswith('\\begin{tabular}') or SNIPPET_SKIP_PATTERN.search(cleaned):
+                continue
+            key = hashlib.sha256(f"{setup_hash}\0{cleaned}".encode('utf-8')).hexdigest()
+            candidates[table] = (key, cleaned)
+        if not candidates:
+            return
+
+        cache = get_cache()
+        external_dir = self.output_dir / EXTERNAL_DIR
+        pending = {}
+        for key, cleaned in candidates.values():
+            if not cache.get_file('snippets', key, external_dir / f"{key}.pdf") \
+                    and cache.get('snippet_failures', key) is None:
+                pending[key] = cleaned
+        if pending:
+            from concurrent.futures import ThreadPoolExecutor
+
+            print(f"Typesetting {len(pending)} table snippets on {min(MAX_WORKERS, len(pending))} workers...")
+            work_root = self.temp_dir / "snippets"
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as pool:
+                futures = {
+                    key: pool.submit(self.compile_snippet, cleaned, template_preamble, work_root / key[:16], key)
+                    for key, cleaned in pending.items()
+                }
+                for key, future in futures.items():
+                    try:
+                        compiled = future.result()
+                    except OSError as e:
+                        compiled = False
+                        print(f"[WARNING] Could not typeset a table snippet: {e}")
+                    if compiled:
+                        external_dir.mkdir(parents=True, exist_ok=True)
+                        shutil.copyfile(work_root / key[:16] / "snippet.pdf", external_dir / f"{key}.pdf")
+
+        externalized = 0
+        for table, (key, _) in candidates.items():
+            if not (external_dir / f"{key}.pdf").exists():
+                continue
+            self.table_snippets[table] = f"\\externalsnippet{{{EXTERNAL_DIR}/{key}.pdf}}"
+            externalized += 1
+        print(f"[OK] {externalized} of {len(candidates)} tables included as PDF snippets")
+
+    def prefetch_tables(self, content):
+        """
+        Clean all tables of a table-heavy document in a process pool.
+
+        Table spans are extracted up front and dispatched in chunks; results
+        are stored in self.table_results so the single-traversal table passes
+        splice them back in document order without re-cleaning.
+        """
+        if not PARALLEL_TABLES or MAX_WORKERS < 2:
+            return
+
+        tables = [table for table in self.find_tables(content) if not self.cached_table_result(table)]
+        if len(tables) < PARALLEL_TABLES_MIN:
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        workers = min(MAX_WORKERS, len(tables))
+        chunksize = max(1, len(tables) // (workers * 4))
+        print(f"Cleaning {len(tables)} tables on {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cli_settings(),)) as pool:
+            for table, result in zip(tables, pool.map(parse_and_clean, tables, chunksize=chunksize)):
+                self.table_results[table] = result
+
+    def replace_table(self, match):
+        cleaned = self.clean_latex_table(match.group(0))
+        return self.table_snippets.get(match.group(0), cleaned)
+
     def process_tables_custom(self, content):
+        """Clean the tables in content (the longtable and tabular passes on their own)"""
+        return self.run_passes(content, self.passes_for(self.replace_table))
+
+    def register_pass(self, name, handler, environments=(), commands=()):
         """
-        New robust method: cleans tables in content, replacing in-place
-        """
-        print("Processing tables (new logic) ...")
-        def detect_num_columns(table_str):
-            # Look for begin{longtable} or begin{tabular}, extract column spec
-            colspec_match = re.search(r'\\begin\{(?:longtable|tabular)[^}]*\}\s*\{([^}]*)\}', table_str)
-            if not colspec_match:
-                # fallback: count max "&" in lines + 1
-                amp_counts = [line.count('&') for line in table_str.splitlines() if '&' in line]
-                return max(amp_counts) + 1 if amp_counts else 1
-            colspec = colspec_match.group(1)
-
-            # Count 'p{' occurrences or [lcr]
-            n_p = len(re.findall(r'p\{[^\}]+\}', colspec))
-            n_basic = len(re.findall(r'[lcr]', re.sub(r'p\{[^\}]+\}', '', colspec)))
-            return n_p + n_basic
-
-        def clean_latex_table(table_str):
-            ncol = detect_num_columns(table_str)
-            print(f'Found columns are {ncol}')
-            # Remove minipage blocks
-            table_str = re.sub(r'\\begin\{minipage\}.*?\\end\{minipage\}', '', table_str, flags=re.DOTALL)
-            # Remove formatting lines
-            lines = table_str.split('\n')
-            cleaned_lines = []
-            header_skipped = False
-
-            for line in lines:
-                lstripped = line.strip()
-                if lstripped == '' or lstripped.startswith('\\toprule') or lstripped.startswith('\\midrule') \
-                        or lstripped.startswith('\\bottomrule') or lstripped.startswith('\\noalign') \
-                        or lstripped.startswith('\\endhead') or lstripped.startswith('\\endlastfoot'):
-                    continue
-
-                # Skip header line with column count - 1 &
-                if not header_skipped and line.count('&') == (ncol-1):
-                    header_skipped = True
-                    continue
-
-                cleaned_lines.append(line)
-
-            # Remove any lines containing only whitespace after cleaning
-            cleaned_lines = [l for l in cleaned_lines if l.strip() != '']
-            return '\n'.join(cleaned_lines)
-
-        def rep_table_table(match):
-            return clean_latex_table(match.group(0))
-
-        # Process all longtables
-        content = re.sub(r'\\begin\{longtable\}.*?\\end\{longtable\}', rep_table_table, content, flags=re.DOTALL)
-        # Process all tabulars not inside table/longtable already (standalone)
-        # This is a simplified but robust approach. Adjust if you see odd behaviors.
-        content = re.sub(r'\\begin\{tabular\}.*?\\end\{tabular\}', rep_table_table, content, flags=re.DOTALL)
-        return content
-    
+        Register a post-processing pass for run_passes.
+
+        Args:
+            name (str): Name used in timing reports
+            handler (callable): Called with a match object for each target,
+                returns the replacement text. Environment matches cover
+                \\begin{env}...\\end{env}; command matches expose the optional
+                [options] as group 1 and the {argument} as group 2.
+            environments (list): Environment names the pass targets, e.g. 'longtable'
+            commands (list): Command names the pass targets, e.g. 'includegraphics'
+        """
+        patterns = [rf'\\begin\{{{re.escape(env)}\}}.*?\\end\{{{re.escape(env)}\}}' for env in environments]
+        if commands:
+            names = '|'.join(re.escape(cmd) for cmd in commands)
+            patterns.append(rf'\\(?:{names})(\[[^\]]*\])?\{{([^}}]+)\}}')
+        if not patterns:
+            raise ValueError(f"Pass {name} declares no environments or commands")
+
+        self.passes.append({
+            'name': name,
+            'handler': handler,
+            'pattern': re.compile('|'.join(patterns), re.DOTALL),
+            'matches': 0,
+            'seconds': 0.0,
+        })
+
+    def register_default_passes(self):
+        """Register the built-in table and image passes, in their historical order"""
+        self.register_pass('longtables', self.replace_table, environments=['longtable'])
+        self.register_pass('tabulars', self.replace_table, environments=['tabular'])
+        self.register_pass('images', self.replace_image, commands=['includegraphics'])
+
+    def passes_for(self, handler):
+        """Registered passes that use handler, in registration order"""
+        return [p for p in self.passes if p['handler'] == handler]
+
+    def run_passes(self, content, passes=None):
+        """Apply all registered passes to content and return the result as one string"""
+        return ''.join(self.iter_passes(content, passes))
+
+    def iter_passes(self, content, passes=None, start=0):
+        """
+        Apply all registered passes in a single traversal of content[start:].
+
+        One combined regex locates the next target of any pass; text between
+        targets is passed through untouched and the output is produced as a
+        sequence of chunks, so callers can write it out without building the
+        whole document as one string.
+        A replacement produced by a pass is itself dispatched to the passes
+        registered after it, matching what running them in sequence did.
+
+        Yields:
+            str: Consecutive chunks of the processed text
+        """
+        passes = self.passes if passes is None else passes
+        if not passes:
+            yield content[start:]
+            return
+
+        combined = re.compile(
+            '|'.join(f"(?P<p{i}>{p['pattern'].pattern})" for i, p in enumerate(passes)),
+            re.DOTALL
+        )
+
+        position = start
+        for located in combined.finditer(content, start):
+            index = int(located.lastgroup[1:])
+            current = passes[index]
+            match = current['pattern'].match(content, located.start())
+
+            started = time.perf_counter()
+            replacement = current['handler'](match)
+            current['seconds'] += time.perf_counter() - started
+            current['matches'] += 1
+
+            if index + 1 < len(passes):
+                replacement = self.run_passes(replacement, passes[index + 1:])
+
+            yield content[position:located.start()]
+            yield replacement
+            position = located.end()
+
+        yield content[position:]
+
+    def report_pass_timings(self):
+        for current in self.passes:
+            print(f"  Pass {current['name']}: {current['matches']} matches in {current['seconds'] * 1000:.1f} ms")
 
     def merge_latex_with_template_preamble(self, converted_latex_file, template_preamble):
-        """Step 2 continued: Merge converted LaTeX with template preamble"""
+        """
+        Step 2 continued: Merge converted LaTeX with template preamble
+
+        Returns:
+            list: The merged document as a list of string chunks
+        """
         print("Step 2: Merging LaTeX with template preamble...")
         
         # Try multiple encodings to read the converted LaTeX file
@@ -596,36 +1506,541 @@ class SimplifiedDOCXConverter:
                 print("[OK] Read converted LaTeX with utf-8 encoding (ignoring errors)")
             except Exception as e:
                 print(f"[ERROR] Failed to read converted LaTeX file: {e}")
-                return ""
-        
-        begin_doc_match = re.search(r'\\begin\{document\}', latex_content)
-        if begin_doc_match:
-            document_content = latex_content[begin_doc_match.start():]
-        else:
-            document_content = f"\\begin{{document}}\n{latex_content}\n\\end{{document}}"
-        
-        required_packages = [
-            "\\usepackage{graphicx}",
-            "\\usepackage{booktabs}",
-        ]
+                return []
         
-        for package in required_packages:
+        for package in (f"\\usepackage{{{name}}}" for name in REQUIRED_PACKAGES):
             if package not in template_preamble:
                 template_preamble += f"\n{package}"
+        if EXTERNALIZE_TABLES:
+            template_preamble += f"\n{SNIPPET_INCLUDE_COMMAND}"
         
-        final_content = template_preamble + "\n\n" + document_content
+        self.column_layout = self.detect_column_layout()
+        print(f"[OK] Detected {self.column_layout} layout")
         
-        column_layout = self.detect_column_layout()
-        print(f"[OK] Detected {column_layout} layout")
+        # The document is kept as a list of chunks: the converted body is
+        # never copied into a second full-size string, and the passes stream
+        # their output straight into the list
+        chunks = list(self.iter_passes(template_preamble + "\n\n"))
         
-        final_content = self.process_tables_custom(final_content)
-        print("[OK] Tables processed with custom formatting")
+        begin_doc_match = re.search(r'\\begin\{document\}', latex_content)
+        self.prefetch_tables(latex_content)
+        self.validate_tables(latex_content, template_preamble)
+        self.externalize_tables(latex_content, template_preamble)
+        if begin_doc_match:
+            chunks.extend(self.iter_passes(latex_content, start=begin_doc_match.start()))
+        else:
+            chunks.append("\\begin{document}\n")
+            chunks.extend(self.iter_passes(latex_content))
+            chunks.append("\n\\end{document}")
+        del latex_content
         
-        final_content = self.process_images_optimally(final_content, column_layout)
-        print("[OK] Images processed with optimal sizing")
+        print("[OK] Tables and images processed in a single pass")
+        self.report_pass_timings()
         
-        return final_content
-    
+        return chunks
+
+    @staticmethod
+    def write_document(chunks, output_file):
+        """Write a chunked document to disk without joining it in memory"""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.writelines(chunks)
+    
+    def write_split_document(self, final_latex, output_file):
+        """
+        Write the document as a main file plus one \\include file per \\section.
+
+        Per-section content hashes are kept in a manifest next to the section
+        files. On a re-run with INCLUDEONLY_CHANGED, an \\includeonly list with
+        just the changed sections is added, active only when \\draftonly is
+        defined: compile_pdf's first pass typesets just those sections (the
+        .aux files from the previous run keep page numbers and
+        cross-references of the others intact) and the final pass the whole
+        document, so the main file and the PDF are always complete.
+
+        Args:
+            final_latex (str): Complete merged LaTeX document
+            output_file (Path): Path of the main .tex file
+
+        Returns:
+            list: Names of the sections that changed since the last run
+        """
+        sections_dir = self.output_dir / SECTIONS_DIR
+        sections_dir.mkdir(parents=True, exist_ok=True)
+        manifest_file = sections_dir / "manifest.json"
+
+        begin_doc = re.search(r'\\begin\{document\}', final_latex)
+        end_doc = final_latex.rfind('\\end{document}')
+        if not begin_doc or end_doc < begin_doc.end():
+            print("[WARNING] Could not locate document body, writing a single file")
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(final_latex)
+            return []
+
+        preamble = final_latex[:begin_doc.start()]
+        body = final_latex[begin_doc.end():end_doc]
+
+        # Everything before the first \section (title, abstract) stays in the main file
+        boundaries = [m.start() for m in re.finditer(r'^\\section\*?[\[{]', body, flags=re.MULTILINE)]
+        front_matter = body[:boundaries[0]] if boundaries else body
+        chunks = [body[start:end] for start, end in zip(boundaries, boundaries[1:] + [len(body)])]
+
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+
+        preamble_hash = hashlib.sha256((preamble + front_matter).encode('utf-8')).hexdigest()
+        manifest = {'preamble': preamble_hash, 'sections': {}}
+        previous_sections = previous.get('sections', {})
+        changed = []
+
+        for index, chunk in enumerate(chunks, start=1):
+            name = f"section_{index:03d}"
+            content_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+            manifest['sections'][name] = content_hash
+            section_file = sections_dir / f"{name}.tex"
+
+            if previous_sections.get(name) != content_hash or not section_file.exists():
+                changed.append(name)
+                with open(section_file, 'w', encoding='utf-8') as f:
+                    f.write(chunk)
+
+        # Drop section files left over from a longer previous revision
+        for name in set(previous_sections) - set(manifest['sections']):
+            (sections_dir / f"{name}.tex").unlink(missing_ok=True)
+
+        # \includeonly is only safe when the surrounding document is unchanged
+        incremental = ((INCLUDEONLY_CHANGED or DRAFT_BUILD) and not PARALLEL_CHAPTERS and previous.get('preamble') == preamble_hash
+                       and set(previous_sections) == set(manifest['sections']) and changed)
+
+        parts = [preamble.rstrip(), "\n"]
+        if incremental:
+            include_list = ','.join(f"{SECTIONS_DIR}/{name}" for name in changed)
+            parts.append(f"\\ifdefined\\draftonly\\includeonly{{{include_list}}}\\fi\n")
+        if PARALLEL_CHAPTERS:
+            # Chapter jobs select their section with \def\chapteronly{..} on the command line
+            parts.append("\\ifdefined\\chapteronly\\includeonly{\\chapteronly}\\fi\n")
+        parts.append("\n\\begin{document}")
+        parts.append(front_matter)
+        if PARALLEL_CHAPTERS:
+            # Empty include whose checkpoint records the counters after the front matter
+            (sections_dir / f"{FRONT_MATTER_SECTION}.tex").write_text("", encoding='utf-8')
+            parts.append(f"\\include{{{SECTIONS_DIR}/{FRONT_MATTER_SECTION}}}\n")
+        parts.extend(f"\\include{{{SECTIONS_DIR}/{name}}}\n" for name in manifest['sections'])
+        parts.append(final_latex[end_doc:])
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.writelines(parts)
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        self.draft_build = bool(incremental)
+        if incremental:
+            print(f"[OK] Split into {len(chunks)} sections, {len(changed)} changed: {', '.join(changed)}")
+        else:
+            print(f"[OK] Split into {len(chunks)} sections (full build)")
+        return changed
+
+    def get_tool_version(self, tool):
+        """Return the first line of `tool --version`, cached per converter"""
+        if tool not in self.tool_versions:
+            try:
+                result = subprocess.run([tool, '--version'], capture_output=True, text=True, check=True)
+                self.tool_versions[tool] = result.stdout.split('\n', 1)[0].strip()
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                self.tool_versions[tool] = ''
+        return self.tool_versions[tool]
+
+    def build_manifest(self, tex_file):
+        """
+        Hash every input of the final pdflatex build.
+
+        Covers the .tex file, files it pulls in with \\include/\\input, every
+        \\includegraphics target, the template's .cls file and the pdflatex
+        version.
+
+        Returns:
+            dict: Mapping of input name to content hash
+        """
+        base_dir = tex_file.parent
+        manifest = {'tex': self.file_sha256(tex_file)}
+
+        with open(tex_file, 'r', encoding='utf-8', errors='ignore') as f:
+            tex_content = f.read()
+
+        for include in re.findall(r'\\(?:include|input)\{([^}]+)\}', tex_content):
+            include_file = base_dir / include
+            if include_file.suffix != '.tex':
+                include_file = include_file.with_name(include_file.name + '.tex')
+            if include_file.exists():
+                manifest[f'include:{include}'] = self.file_sha256(include_file)
+
+        for image in re.findall(r'\\includegraphics(?:\[[^\]]*\])?\{([^}]+)\}', tex_content):
+            image_file = base_dir / image
+            manifest[f'image:{image}'] = self.file_sha256(image_file) if image_file.exists() else None
+
+        cls_file = self.template_cls_file()
+        manifest['cls'] = self.file_sha256(cls_file) if cls_file else None
+        manifest['pdflatex'] = self.get_tool_version('pdflatex')
+        if DETERMINISTIC_BUILD:
+            manifest['source_date_epoch'] = self.source_date_epoch()
+        return manifest
+
+    def run_pdflatex(self, tex_name, stdout_log, cwd=None, options=()):
+        """
+        Run one pdflatex pass, streaming its output line by line.
+
+        Output is written to stdout_log as it arrives and parsed on the fly.
+        The whole process group is killed as soon as a fatal pattern or
+        LATEX_MAX_ERRORS errors show up, instead of waiting for nonstopmode
+        to reach the end of the document or the timeout.
+
+        Returns:
+            dict: returncode, error_lines, tail (last lines of output) and
+                  aborted (reason for an early abort or None)
+        """
+        monitor = LatexOutputMonitor()
+        timed_out = threading.Event()
+
+        process = subprocess.Popen(PDFLATEX_ARGS + list(options) + [tex_name], cwd=cwd,
+                                   env=latex_environment(self.source_date_epoch()),
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                   text=True, errors='replace', start_new_session=hasattr(os, 'killpg'))
+
+        def on_timeout():
+            timed_out.set()
+            kill_process_group(process)
+
+        watchdog = threading.Timer(LATEX_TIMEOUT, on_timeout)
+        watchdog.start()
+        try:
+            with open(stdout_log, 'w', encoding='utf-8') as log:
+                for line in process.stdout:
+                    log.write(line)
+                    if monitor.feed(line):
+                        kill_process_group(process)
+                        break
+            returncode = process.wait()
+        finally:
+            watchdog.cancel()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(process.args, LATEX_TIMEOUT)
+
+        return monitor.result(returncode)
+
+    async def run_pdflatex_async(self, tex_name, stdout_log, cwd=None, options=()):
+        """Asyncio counterpart of run_pdflatex, with the same early abort and result"""
+        import asyncio
+
+        monitor = LatexOutputMonitor()
+        process = await asyncio.create_subprocess_exec(
+            *PDFLATEX_ARGS, *options, tex_name, cwd=cwd, env=latex_environment(self.source_date_epoch()),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=hasattr(os, 'killpg'), limit=1 << 20)
+
+        async def stream():
+            with open(stdout_log, 'w', encoding='utf-8') as log:
+                async for raw_line in process.stdout:
+                    line = raw_line.decode('utf-8', errors='replace')
+                    log.write(line)
+                    if monitor.feed(line):
+                        kill_process_group(process)
+                        break
+            return await process.wait()
+
+        try:
+            returncode = await asyncio.wait_for(stream(), LATEX_TIMEOUT)
+        except asyncio.TimeoutError:
+            kill_process_group(process)
+            await process.wait()
+            raise subprocess.TimeoutExpired(PDFLATEX_ARGS + list(options) + [tex_name], LATEX_TIMEOUT)
+
+        return monitor.result(returncode)
+
+    def lookup_build_cache(self, tex_file):
+        """
+        Reuse the cached PDF of an identical earlier build if there is one.
+
+        Returns:
+            tuple: (key the PDF of this build is cached under or None,
+                    True if a cached PDF was copied to the output)
+        """
+        if not BUILD_CACHE:
+            return None, False
+        manifest = self.build_manifest(tex_file)
+        build_key = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+        if get_cache().get_file('pdf', build_key, tex_file.with_suffix('.pdf')):
+            print(f"[SUCCESS] Build inputs unchanged, reused cached PDF: {tex_file.with_suffix('.pdf')}")
+            return build_key, True
+        return build_key, False
+
+    def compile_draft(self, tex_file):
+        """
+        Typeset only the sections changed since the last build (--draft).
+
+        One pdflatex pass with its own job name writes <name>-draft.pdf;
+        page numbers and references into the other sections come from the
+        .aux files of the previous build. Without a previous split build, or
+        if more than the sections changed, the whole document is typeset. The
+        output PDF and the PDF cache are left alone.
+
+        Returns:
+            bool: True if the draft PDF was written
+        """
+        jobname = f"{tex_file.stem}{DRAFT_SUFFIX}"
+        main_aux = tex_file.with_suffix('.aux')
+        previous_aux = ""
+        if main_aux.exists():
+            shutil.copyfile(main_aux, self.output_dir / f"{jobname}.aux")
+            previous_aux = main_aux.read_text(encoding='latin-1')
+        # Skipped sections need the checkpoints of a previous split build
+        if self.draft_build and f"\\@input{{{SECTIONS_DIR}/" in previous_aux:
+            command = f"\\def\\draftonly{{}}\\input{{{tex_file.name}}}"
+        else:
+            print("  [WARNING] No sections to skip, the draft typesets the whole document")
+            command = tex_file.name
+
+        stdout_log = self.output_dir / f"{jobname}.stdout"
+        result = self.run_pdflatex(command, stdout_log, cwd=self.output_dir, options=(f'-jobname={jobname}',))
+        self.report_latex_pass(0, result)
+        draft_pdf = self.output_dir / f"{jobname}.pdf"
+        if not draft_pdf.exists():
+            print("[ERROR] Draft PDF not created")
+            return False
+        print(f"[SUCCESS] Draft PDF created: {draft_pdf}")
+        return True
+
+    def latex_passes(self, tex_file):
+        """
+        The two pdflatex passes of a build, as (command, options) pairs.
+
+        For a draft build of a split document the first pass only typesets
+        the changed sections (refreshing their .aux files) without writing a
+        PDF; the second pass always typesets the whole document.
+        """
+        full_pass = (tex_file.name, ())
+        if not self.draft_build:
+            return [full_pass, full_pass]
+        draft_pass = (f"\\def\\draftonly{{}}\\input{{{tex_file.name}}}", (f'-jobname={tex_file.stem}', '-draftmode'))
+        return [draft_pass, full_pass]
+
+    @staticmethod
+    def report_latex_pass(i, result):
+        """Print the outcome of pdflatex pass i, return True if no further pass should run"""
+        if result['returncode'] == 0:
+            print(f"  [OK] LaTeX pass {i+1} completed successfully")
+            return False
+
+        print(f"[WARNING] LaTeX pass {i+1} had issues (return code: {result['returncode']})")
+        
+        # Show relevant error messages
+        if result['error_lines']:
+            print("  Key errors found:")
+            for error_line in result['error_lines'][:5]:  # Show first 5 errors
+                print(f"    {error_line.strip()}")
+        
+        if result['aborted']:
+            print(f"  [ERROR] Aborted pdflatex early: {result['aborted']}")
+        
+        if i == 1 or result['aborted']:  # Only show detailed error on final pass
+            print("\n  Full LaTeX output (last 800 chars):")
+            print(result['tail'][-800:] if result['tail'] else "No stdout")
+            return True
+        return False
+
+    @staticmethod
+    def finish_pdf(tex_file, build_key, clean_build):
+        """Check the PDF was produced and store it in the build cache"""
+        pdf_file = tex_file.with_suffix('.pdf')
+        if pdf_file.exists():
+            print(f"[SUCCESS] PDF created successfully: {pdf_file}")
+            # Only cache builds where pdflatex reported no errors
+            if build_key and clean_build:
+                get_cache().put_file('pdf', build_key, pdf_file, compress=False)
+            return True
+        else:
+            print("[ERROR] PDF not created, but .tex file is available")
+            print("Check the LaTeX file manually for compilation issues")
+            return False
+
+    @staticmethod
+    def report_compile_error(error):
+        if isinstance(error, subprocess.TimeoutExpired):
+            print(f"[ERROR] PDF compilation timed out after {LATEX_TIMEOUT} seconds")
+            print("The LaTeX compilation may be stuck - check your .tex file")
+        elif isinstance(error, FileNotFoundError):
+            print("[ERROR] pdflatex not found. Install LaTeX distribution.")
+        else:
+            print(f"[ERROR] PDF compilation failed: {error}")
+        return False
+
+    @staticmethod
+    def read_checkpoint(aux_file):
+        """Counter values recorded at the end of an \\include, from its .aux file"""
+        try:
+            with open(aux_file, 'r', encoding='latin-1') as f:
+                checkpoint = CHECKPOINT_PATTERN.search(f.read())
+        except OSError:
+            return None
+        if not checkpoint:
+            return None
+        return {name: int(value) for name, value in CHECKPOINT_COUNTER_PATTERN.findall(checkpoint.group(2))}
+
+    @staticmethod
+    def write_checkpoint(aux_file, counters):
+        """Rewrite the counter values of an \\include's checkpoint"""
+        # latin-1 round-trips any bytes, labels in the file are left untouched
+        with open(aux_file, 'r', encoding='latin-1') as f:
+            aux = f.read()
+        checkpoint = CHECKPOINT_PATTERN.search(aux)
+        block = CHECKPOINT_COUNTER_PATTERN.sub(
+            lambda m: f"\\setcounter{{{m.group(1)}}}{{{counters.get(m.group(1), int(m.group(2)))}}}",
+            checkpoint.group(2))
+        with open(aux_file, 'w', encoding='latin-1') as f:
+            f.write(aux[:checkpoint.start(2)] + block + aux[checkpoint.end(2):])
+
+    def merge_chapter_checkpoints(self, aux_dir, names):
+        """
+        First-pass .aux merge: each chapter was compiled as if it followed the
+        front matter directly, so its checkpoint holds the counters' increase
+        within the chapter. Accumulate those in document order and write the
+        absolute values back, so the next round starts every chapter on the
+        right page, section number, figure number, ...
+        """
+        baseline = self.read_checkpoint(aux_dir / f"{FRONT_MATTER_SECTION}.aux")
+        if baseline is None:
+            return False
+        running = dict(baseline)
+        for name in names:
+            counters = self.read_checkpoint(aux_dir / f"{name}.aux")
+            if counters is None:
+                return False
+            for counter, value in counters.items():
+                start = baseline.get(counter, 0)
+                # A counter below its starting value was reset within the chapter
+                # (e.g. subsections by \section), its value is already absolute
+                running[counter] = value if value < start else running.get(counter, start) + value - start
+            self.write_checkpoint(aux_dir / f"{name}.aux", running)
+        return True
+
+    def compile_chapters(self, tex_file):
+        """
+        Compile a split document's sections as parallel pdflatex jobs.
+
+        Every job typesets the front matter plus one section (\\includeonly,
+        own -jobname) in its own directory below CHAPTER_BUILD_DIR, starting
+        from a private copy of the section checkpoints; the .aux file of its
+        section is collected back once the round is over:
+          1. all sections in draft mode, in parallel
+          2. .aux merge: checkpoints get cumulative page and counter offsets
+          3. all sections in draft mode again, writing correct labels
+          4. the front matter and all sections for real
+        The chapter PDFs are then assembled with pdfpages, which keeps only
+        the page content: links, bookmarks and PDF metadata are lost, so
+        documents that load hyperref are compiled serially instead.
+
+        Returns:
+            bool: True if every job succeeded and the PDF was assembled,
+                  None if the parallel build failed (compile serially instead)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from tex_preflight import template_requirements
+
+        with open(tex_file, 'r', encoding='utf-8', errors='replace') as f:
+            preamble = f.read().split("\\begin{document}", 1)[0]
+        if 'hyperref.sty' in template_requirements(preamble, self.read_cls_content()):
+            print("  [WARNING] hyperref is loaded and assembled chapter PDFs would lose their links, "
+                  "not compiling chapters in parallel")
+            return None
+
+        sections_dir = self.output_dir / SECTIONS_DIR
+        try:
+            with open(sections_dir / "manifest.json", 'r', encoding='utf-8') as f:
+                names = list(json.load(f)['sections'])
+        except (OSError, ValueError, KeyError):
+            return None
+        if not names:
+            return None
+
+        build_dir = self.output_dir / CHAPTER_BUILD_DIR
+        aux_dir = build_dir / SECTIONS_DIR
+        # Checkpoints and job .aux files from an earlier build would offset the first round
+        shutil.rmtree(build_dir, ignore_errors=True)
+        aux_dir.mkdir(parents=True)
+
+        front_job = ('front', FRONT_MATTER_SECTION)
+        chapter_jobs = [(f"chap_{name.rsplit('_', 1)[-1]}", name) for name in names]
+
+        def run_job(job, draft):
+            jobname, section = job
+            job_aux_dir = build_dir / jobname / SECTIONS_DIR
+            job_aux_dir.mkdir(parents=True, exist_ok=True)
+            for aux_file in aux_dir.glob("*.aux"):
+                shutil.copyfile(aux_file, job_aux_dir / aux_file.name)
+            options = [f'-jobname={jobname}', f'-output-directory={CHAPTER_BUILD_DIR}/{jobname}']
+            if draft:
+                options.append('-draftmode')
+            command = f"\\def\\chapteronly{{{SECTIONS_DIR}/{section}}}\\input{{{tex_file.name}}}"
+            return self.run_pdflatex(command, build_dir / f"{jobname}.stdout", cwd=self.output_dir, options=options)
+
+        def run_round(label, jobs, draft):
+            print(f"  {label}: {len(jobs)} jobs on {min(MAX_WORKERS, len(jobs))} workers...")
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(jobs))) as pool:
+                results = list(pool.map(lambda job: run_job(job, draft), jobs))
+            for jobname, section in jobs:
+                section_aux = build_dir / jobname / SECTIONS_DIR / f"{section}.aux"
+                if section_aux.exists():
+                    shutil.copyfile(section_aux, aux_dir / section_aux.name)
+            failed = [job[0] for job, result in zip(jobs, results) if result['returncode'] != 0]
+            for jobname, result in zip((job[0] for job in jobs), results):
+                if result['returncode'] != 0:
+                    print(f"  [WARNING] Job {jobname} had issues: "
+                          f"{result['aborted'] or (result['error_lines'][:1] or ['see log'])[0].strip()}")
+            return not failed
+
+        if not run_round("Round 1 (draft)", [front_job] + chapter_jobs, draft=True):
+            return None
+        if not self.merge_chapter_checkpoints(aux_dir, names):
+            print("  [WARNING] Could not read chapter checkpoints")
+            return None
+        if not run_round("Round 2 (draft)", chapter_jobs, draft=True):
+            return None
+        if not run_round("Round 3", [front_job] + chapter_jobs, draft=False):
+            return None
+
+        def pages_written(jobname):
+            with open(build_dir / f"{jobname}.stdout", 'r', encoding='utf-8', errors='replace') as f:
+                written = PAGES_WRITTEN_PATTERN.search(f.read().replace('\n', ''))
+            return int(written.group(1)) if written else 0
+
+        # Each chapter PDF starts with the front matter pages
+        front_pages = pages_written('front')
+        includes = []
+        if front_pages:
+            includes.append("\\includepdf[pages=-,fitpaper]{front/front.pdf}")
+        for jobname, _ in chapter_jobs:
+            if pages_written(jobname) > front_pages:
+                includes.append(f"\\includepdf[pages={front_pages + 1}-,fitpaper]{{{jobname}/{jobname}.pdf}}")
+
+        with open(build_dir / "assemble.tex", 'w', encoding='utf-8') as f:
+            f.write("\\documentclass{article}\n\\usepackage{pdfpages}\n")
+            if DETERMINISTIC_BUILD:
+                f.write(DETERMINISTIC_PREAMBLE + "\n")
+            f.write("\\begin{document}\n")
+            f.write('\n'.join(includes))
+            f.write("\n\\end{document}\n")
+        result = self.run_pdflatex("assemble.tex", build_dir / "assemble.stdout", cwd=build_dir)
+        assembled = build_dir / "assemble.pdf"
+        if result['returncode'] != 0 or not assembled.exists():
+            print("  [WARNING] Could not assemble the chapter PDFs")
+            return None
+        shutil.copyfile(assembled, tex_file.with_suffix('.pdf'))
+        print(f"  [OK] Assembled {len(chapter_jobs)} chapters and {front_pages} front matter pages")
+        return True
+
     def compile_pdf(self, tex_file):
         """Step 3: Generate PDF"""
         if not COMPILE_PDF:
@@ -634,62 +2049,214 @@ class SimplifiedDOCXConverter:
             
         print("Step 3: Compiling LaTeX to PDF...")
         
-        original_dir = os.getcwd()
-        
         try:
-            os.chdir(self.output_dir)
+            if DRAFT_BUILD:
+                return self.compile_draft(tex_file)
             
-            for i in range(2):
+            build_key, reused = self.lookup_build_cache(tex_file)
+            if reused:
+                return True
+            
+            if PARALLEL_CHAPTERS:
+                clean_build = self.compile_chapters(tex_file)
+                if clean_build:
+                    return self.finish_pdf(tex_file, build_key, clean_build)
+                print("  [WARNING] Parallel chapter build failed, compiling the whole document")
+            
+            clean_build = False
+            for i, (command, options) in enumerate(self.latex_passes(tex_file)):
                 print(f"  LaTeX pass {i+1}/2...")
-                result = subprocess.run([
-                    'pdflatex', 
-                    '-interaction=nonstopmode',
-                    '-file-line-error',
-                    tex_file.name
-                ], capture_output=True, text=True, timeout=120)  # 2 minute timeout
+                stdout_log = self.output_dir / Path(tex_file.name).with_suffix(f'.pass{i+1}.stdout')
+                result = self.run_pdflatex(command, stdout_log, cwd=self.output_dir, options=options)
+                if self.report_latex_pass(i, result):
+                    break
+                clean_build = i == 1 and result['returncode'] == 0
+            
+            return self.finish_pdf(tex_file, build_key, clean_build)
                 
-                if result.returncode != 0:
-                    print(f"[WARNING] LaTeX pass {i+1} had issues (return code: {result.returncode})")
-                    
-                    # Show relevant error messages
-                    if result.stdout:
-                        error_lines = [line for line in result.stdout.split('\n') 
-                                     if any(keyword in line.lower() for keyword in 
-                                           ['error', 'undefined', 'missing', 'emergency stop'])]
-                        if error_lines:
-                            print("  Key errors found:")
-                            for error_line in error_lines[:5]:  # Show first 5 errors
-                                print(f"    {error_line.strip()}")
-                    
-                    if i == 1:  # Only show detailed error on final pass
-                        print("\n  Full LaTeX output (last 800 chars):")
-                        print(result.stdout[-800:] if result.stdout else "No stdout")
-                        break
-                else:
-                    print(f"  [OK] LaTeX pass {i+1} completed successfully")
+        except Exception as e:
+            return self.report_compile_error(e)
+
+    async def compile_pdf_async(self, tex_file, limits):
+        """Step 3 (asyncio): compile_pdf with pdflatex passes gated by the pdflatex semaphore"""
+        import asyncio
+
+        if not COMPILE_PDF:
+            print("Step 3: PDF compilation skipped (COMPILE_PDF = False)")
+            return True
+            
+        print(f"Step 3: Compiling {tex_file} to PDF...")
+        
+        try:
+            if DRAFT_BUILD:
+                async with limits['pdflatex']:
+                    return await asyncio.to_thread(self.compile_draft, tex_file)
             
-            pdf_file = tex_file.with_suffix('.pdf')
-            if pdf_file.exists():
-                print(f"[SUCCESS] PDF created successfully: {pdf_file}")
+            build_key, reused = await asyncio.to_thread(self.lookup_build_cache, tex_file)
+            if reused:
                 return True
-            else:
-                print("[ERROR] PDF not created, but .tex file is available")
-                print("Check the LaTeX file manually for compilation issues")
-                return False
+            
+            if PARALLEL_CHAPTERS:
+                # The chapter jobs bound their own parallelism by MAX_WORKERS
+                async with limits['pdflatex']:
+                    clean_build = await asyncio.to_thread(self.compile_chapters, tex_file)
+                if clean_build:
+                    return self.finish_pdf(tex_file, build_key, clean_build)
+                print("  [WARNING] Parallel chapter build failed, compiling the whole document")
+            
+            clean_build = False
+            for i, (command, options) in enumerate(self.latex_passes(tex_file)):
+                stdout_log = self.output_dir / Path(tex_file.name).with_suffix(f'.pass{i+1}.stdout')
+                async with limits['pdflatex']:
+                    result = await self.run_pdflatex_async(command, stdout_log, cwd=self.output_dir, options=options)
+                if self.report_latex_pass(i, result):
+                    break
+                clean_build = i == 1 and result['returncode'] == 0
+            
+            return self.finish_pdf(tex_file, build_key, clean_build)
                 
-        except subprocess.TimeoutExpired:
-            print("[ERROR] PDF compilation timed out after 2 minutes")
-            print("The LaTeX compilation may be stuck - check your .tex file")
-            return False
-        except FileNotFoundError:
-            print("[ERROR] pdflatex not found. Install LaTeX distribution.")
-            return False
         except Exception as e:
-            print(f"[ERROR] PDF compilation failed: {e}")
-            return False
-        finally:
-            os.chdir(original_dir)
+            return self.report_compile_error(e)
     
+    def prepare_media(self):
+        """Extract media from the DOCX and normalize it for pdflatex"""
+        image_files = self.extract_images_from_docx()
+        return self.normalize_media(image_files)
+
+    def prepare_source(self):
+        """
+        Extract and normalize media and convert the DOCX to LaTeX.
+
+        Returns:
+            Path: The converted LaTeX file or None on failure
+        """
+        self.prepare_media()
+        return self.convert_source()
+
+    def convert_source(self):
+        """Convert the DOCX to LaTeX: fast path, incremental or pandoc, as configured"""
+        converted_latex = self.convert_docx_fast() if FAST_PATH else None
+        if not converted_latex and INCREMENTAL:
+            converted_latex = self.convert_docx_incremental()
+        if not converted_latex:
+            converted_latex = self.convert_docx_to_latex()
+        return converted_latex
+
+    async def convert_source_async(self, limits):
+        """
+        Step 1 (asyncio): convert the DOCX to LaTeX, running pandoc under the
+        pandoc semaphore without blocking the event loop.
+        """
+        import asyncio
+
+        converted_latex = await asyncio.to_thread(self.convert_docx_fast) if FAST_PATH else None
+        if not converted_latex and INCREMENTAL:
+            async with limits['pandoc']:
+                converted_latex = await asyncio.to_thread(self.convert_docx_incremental)
+        if converted_latex:
+            return converted_latex
+
+        print(f"Step 1: Converting {self.docx_path} to LaTeX...")
+        if not self.docx_path.exists():
+            print(f"[ERROR] Input file not found: {self.docx_path}")
+            return None
+        
+        pandoc_cmd, latex_file = self.pandoc_command()
+        cache_key = await asyncio.to_thread(self.pandoc_cache_key)
+        if await asyncio.to_thread(get_cache().get_file, 'pandoc', cache_key, latex_file):
+            print(f"[OK] {self.docx_path} converted to LaTeX (cached pandoc output)")
+            return latex_file
+        
+        async with limits['pandoc']:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *pandoc_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL)
+            except FileNotFoundError:
+                print("[ERROR] Pandoc not found. Please install pandoc first.")
+                return None
+            _, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            print(f"[ERROR] Pandoc conversion failed: {stderr.decode('utf-8', errors='replace')}")
+            return None
+        await asyncio.to_thread(get_cache().put_file, 'pandoc', cache_key, latex_file)
+        print(f"[OK] {self.docx_path} converted to LaTeX")
+        return latex_file
+
+    def prepare_template(self):
+        """
+        Read the template preamble and run the package and font pre-flight checks.
+
+        Returns:
+            tuple: (preamble including font substitutions, missing package files)
+        """
+        template_preamble = self.extract_preamble_from_template()
+        missing_packages = self.preflight_packages(template_preamble)
+        font_substitutions = self.preflight_fonts(template_preamble)
+        if font_substitutions:
+            template_preamble += "\n% Substitutes for fonts missing from this TeX installation\n" + font_substitutions
+        if DETERMINISTIC_BUILD:
+            template_preamble += "\n% Reproducible PDF output\n" + DETERMINISTIC_PREAMBLE
+        return template_preamble, missing_packages
+
+    def write_output(self, converted_latex, template_preamble):
+        """
+        Merge converted LaTeX into the template preamble, write paper.tex and
+        copy the images next to it.
+
+        Returns:
+            Path: The written .tex file
+        """
+        final_chunks = self.merge_latex_with_template_preamble(converted_latex, template_preamble)
+        if INCREMENTAL:
+            self.save_table_cache()
+        
+        output_file = self.output_dir / "paper.tex"
+        if SPLIT_SECTIONS or PARALLEL_CHAPTERS:
+            self.write_split_document(''.join(final_chunks), output_file)
+        else:
+            self.write_document(final_chunks, output_file)
+        del final_chunks
+        
+        print(f"[SUCCESS] LaTeX file created: {output_file}")
+        
+        images_src = self.temp_dir / "images"
+        images_dst = self.output_dir / "images"
+        if images_src.exists() and any(images_src.iterdir()):
+            if images_dst.exists():
+                shutil.rmtree(images_dst)
+            shutil.copytree(images_src, images_dst)
+            print(f"[OK] Images copied to: {images_dst}")
+        return output_file
+
+    def report_output(self, output_file, pdf_success):
+        images_dst = self.output_dir / "images"
+        print(f"\n{'='*50}")
+        print("CONVERSION COMPLETE!")
+        print(f"{'='*50}")
+        print(f"LaTeX file: {output_file}")
+        if pdf_success:
+            pdf_name = f"{output_file.stem}{DRAFT_SUFFIX}.pdf" if DRAFT_BUILD else f"{output_file.stem}.pdf"
+            print(f"PDF file: {output_file.with_name(pdf_name)}")
+        else:
+            print("LaTeX file is available for manual compilation")
+        if images_dst.exists():
+            print(f"Images: {images_dst}")
+
+    def emit_output(self, converted_latex):
+        """Merge converted LaTeX into this converter's template, write it and compile the PDF"""
+        template_preamble, missing_packages = self.prepare_template()
+        output_file = self.write_output(converted_latex, template_preamble)
+        
+        if missing_packages:
+            print("Step 3: PDF compilation skipped (missing LaTeX packages)")
+            pdf_success = False
+        else:
+            pdf_success = self.compile_pdf(output_file)
+        
+        self.report_output(output_file, pdf_success)
+        return True
+
     def convert(self):
         """Main simplified conversion process"""
         print("Starting simplified DOCX to LaTeX conversion...")
@@ -700,77 +2267,606 @@ class SimplifiedDOCXConverter:
         if not self.check_dependencies():
             return False
         
+        if STAGE_GRAPH:
+            # Intermediate artifacts persist between runs in a working directory of their own
+            work_key = f"{self.docx_path.resolve()}\0{self.output_dir.resolve()}"
+            self.temp_dir = Path(BUILD_DIR) / hashlib.sha256(work_key.encode('utf-8')).hexdigest()[:16]
+        
         try:
-            self.temp_dir.mkdir(exist_ok=True)
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
             self.output_dir.mkdir(exist_ok=True)
         except Exception as e:
             print(f"[ERROR] Failed to create directories: {e}")
             return False
         
         try:
-            self.extract_images_from_docx()
+            if STAGE_GRAPH:
+                return self.run_stage_graph()
             
-            converted_latex = self.convert_docx_to_latex()
+            converted_latex = self.prepare_source()
             if not converted_latex:
                 return False
             
-            template_preamble = self.extract_preamble_from_template()
-            final_latex = self.merge_latex_with_template_preamble(converted_latex, template_preamble)
+            return self.emit_output(converted_latex)
             
-            output_file = self.output_dir / "paper.tex"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(final_latex)
-            
-            print(f"[SUCCESS] LaTeX file created: {output_file}")
-            
-            images_src = self.temp_dir / "images"
-            images_dst = self.output_dir / "images"
-            if images_src.exists() and any(images_src.iterdir()):
-                if images_dst.exists():
-                    shutil.rmtree(images_dst)
-                shutil.copytree(images_src, images_dst)
-                print(f"[OK] Images copied to: {images_dst}")
+        except Exception as e:
+            print(f"[ERROR] Conversion failed: {e}")
+            logger.exception("Detailed error information:")
+            return False
+        
+        finally:
+            if not STAGE_GRAPH:
+                self.cleanup_temp_dir()
+
+    def build_stage_graph(self):
+        """
+        The conversion as a stage graph:
+
+            media ----------+
+            latex ----------+--> document --> pdf
+            template -------+
+        """
+        from build_graph import BuildGraph, code_version
+
+        module_dir = Path(__file__).resolve().parent
+        sources = [module_dir / f"{name}.py" for name in
+                   ('simplified_docx_converter', 'docx_xml', 'table_model', 'template_registry', 'tex_preflight')]
+        graph = BuildGraph(self.temp_dir / "stamps", code_version(sources))
+        cls_file = self.template_cls_file()
+        output_file = self.output_dir / "paper.tex"
+
+        def convert_latex():
+            converted_latex = self.convert_source()
+            return str(converted_latex) if converted_latex else None
+
+        def build_document(converted_latex, media_map, template):
+            self.media_map = dict(media_map)
+            template_preamble, _ = template
+            return str(self.write_output(Path(converted_latex), template_preamble))
+
+        def build_pdf(tex_file, template):
+            _, missing_packages = template
+            if missing_packages:
+                print("Step 3: PDF compilation skipped (missing LaTeX packages)")
+                return False
+            return self.compile_pdf(Path(tex_file))
+
+        graph.add_stage('media', self.prepare_media, inputs=[self.docx_path],
+                        params={'normalize': NORMALIZE_MEDIA, 'referenced_only': REFERENCED_MEDIA_ONLY},
+                        outputs=[self.temp_dir / "images"])
+        graph.add_stage('latex', convert_latex, inputs=[self.docx_path],
+                        params={'fast_path': FAST_PATH, 'incremental': INCREMENTAL,
+                                'pandoc': self.get_tool_version('pandoc')},
+                        outputs=[self.temp_dir / "converted.tex", self.temp_dir / "media"])
+        # Not stamped while packages or fonts are missing, so installing them takes effect on the next run
+        graph.add_stage('template', lambda: list(self.prepare_template()), inputs=[self.template_path, cls_file],
+                        params={'packages': PACKAGE_PREFLIGHT, 'fonts': FONT_PREFLIGHT, 'deterministic': DETERMINISTIC_BUILD,
+                                'required': REQUIRED_PACKAGES, 'pdflatex': self.get_tool_version('pdflatex')},
+                        stamp=lambda template: not template[1] and not self.missing_fonts)
+        graph.add_stage('document', build_document, deps=['latex', 'media', 'template'],
+                        inputs=[self.template_path, cls_file],
+                        params={'split_sections': SPLIT_SECTIONS, 'includeonly_changed': INCLUDEONLY_CHANGED,
+                                'parallel_chapters': PARALLEL_CHAPTERS,
+                                'validate_tables': VALIDATE_TABLES, 'ai_tables': AI_TABLE_CORRECTION,
+                                'externalize_tables': EXTERNALIZE_TABLES},
+                        outputs=[output_file, self.output_dir / "images", self.output_dir / SECTIONS_DIR,
+                                 self.output_dir / EXTERNAL_DIR])
+        # The class file and pdflatex also shape the PDF when the .tex file comes out identical
+        # A draft PDF is never the stage's result: the next full build runs it again
+        graph.add_stage('pdf', build_pdf, deps=['document', 'template'], inputs=[cls_file],
+                        params={'compile': COMPILE_PDF, 'pdflatex': self.get_tool_version('pdflatex'),
+                                'source_date_epoch': self.source_date_epoch() if DETERMINISTIC_BUILD else None},
+                        outputs=[output_file.with_suffix('.pdf')], stamp=lambda result: not DRAFT_BUILD)
+        return graph
+
+    def run_stage_graph(self):
+        """Run the stage graph, re-executing only stages whose fingerprints changed"""
+        graph = self.build_stage_graph()
+        tex_file = graph.run('document')
+        if not tex_file:
+            return False
+        
+        pdf_success = bool(graph.run('pdf'))
+        print(f"[OK] Stages run: {', '.join(graph.executed) or 'none (all up to date)'}")
+        self.report_output(Path(tex_file), pdf_success)
+        return True
+
+    async def convert_async(self, limits):
+        """
+        Asyncio version of convert() that overlaps independent stages.
+
+        Pandoc, media extraction/normalization and template parsing with the
+        pre-flight checks run concurrently; the merge then runs in a worker
+        thread and the pdflatex passes as asyncio subprocesses. limits maps
+        each external tool to the semaphore bounding its concurrent runs.
+        """
+        import asyncio
+
+        print(f"Starting conversion of {self.docx_path} -> {self.output_dir}")
+        
+        if not await asyncio.to_thread(self.check_dependencies):
+            return False
+        
+        try:
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            print(f"[ERROR] Failed to create directories: {e}")
+            return False
+        
+        try:
+            # None of these depend on each other's output
+            converted_latex, _, (template_preamble, missing_packages) = await asyncio.gather(
+                self.convert_source_async(limits),
+                asyncio.to_thread(self.prepare_media),
+                asyncio.to_thread(self.prepare_template),
+            )
+            if not converted_latex:
+                return False
             
-            pdf_success = self.compile_pdf(output_file)
+            output_file = await asyncio.to_thread(self.write_output, converted_latex, template_preamble)
             
-            print(f"\n{'='*50}")
-            print("CONVERSION COMPLETE!")
-            print(f"{'='*50}")
-            print(f"LaTeX file: {output_file}")
-            if pdf_success:
-                print(f"PDF file: {output_file.with_suffix('.pdf')}")
+            if missing_packages:
+                print("Step 3: PDF compilation skipped (missing LaTeX packages)")
+                pdf_success = False
             else:
-                print("LaTeX file is available for manual compilation")
-            if images_dst.exists():
-                print(f"Images: {images_dst}")
+                pdf_success = await self.compile_pdf_async(output_file, limits)
             
+            self.report_output(output_file, pdf_success)
             return True
             
         except Exception as e:
-            print(f"[ERROR] Conversion failed: {e}")
+            print(f"[ERROR] Conversion of {self.docx_path} failed: {e}")
             logger.exception("Detailed error information:")
             return False
         
         finally:
-            if self.temp_dir.exists():
-                try:
-                    shutil.rmtree(self.temp_dir, ignore_errors=True)
-                    print("[OK] Cleaned up temporary files")
-                except Exception as e:
-                    print(f"[WARNING] Could not clean up temp directory: {e}")
+            await asyncio.to_thread(self.cleanup_temp_dir)
+
+    def convert_for_templates(self, template_paths):
+        """
+        Convert the DOCX once and emit it for several journal templates.
+
+        Pandoc and media extraction run once; the template merge,
+        post-processing and PDF compilation run for each template in
+        parallel worker processes, each writing to its own subdirectory of
+        the output directory named after the template.
+
+        Returns:
+            dict: Mapping of template path to success
+        """
+        print("Starting multi-template DOCX to LaTeX conversion...")
+        print(f"Input file: {self.docx_path}")
+        print(f"Templates: {', '.join(str(t) for t in template_paths)}")
+        print(f"Output directory: {self.output_dir}")
+        
+        if not self.check_dependencies():
+            return {}
+        
+        try:
+            self.temp_dir.mkdir(exist_ok=True)
+            self.output_dir.mkdir(exist_ok=True)
+        except Exception as e:
+            print(f"[ERROR] Failed to create directories: {e}")
+            return {}
+        
+        try:
+            converted_latex = self.prepare_source()
+            if not converted_latex:
+                return {}
+            
+            targets = {}
+            for template_path in template_paths:
+                name = Path(template_path).stem
+                output_dir = self.output_dir / name
+                suffix = 2
+                while output_dir in targets.values():
+                    output_dir = self.output_dir / f"{name}_{suffix}"
+                    suffix += 1
+                targets[template_path] = output_dir
+            
+            from concurrent.futures import ProcessPoolExecutor
+            from cache_manager import call_in_worker
+            
+            results = {}
+            # Workers get the command line settings, open their own cache and hand back its counters
+            with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(targets)),
+                                     initializer=init_worker, initargs=(cli_settings(),)) as pool:
+                futures = {
+                    template_path: pool.submit(call_in_worker, emit_for_template, self.docx_path, template_path,
+                                               output_dir, self.temp_dir, converted_latex, self.media_map)
+                    for template_path, output_dir in targets.items()
+                }
+                for template_path, future in futures.items():
+                    try:
+                        results[template_path], counts = future.result()
+                        get_cache().merge_counts(counts)
+                    except Exception as e:
+                        print(f"[ERROR] Conversion for {template_path} failed: {e}")
+                        results[template_path] = False
+            
+            for template_path, success in results.items():
+                status = "[OK]" if success else "[ERROR]"
+                print(f"{status} {template_path} -> {targets[template_path]}")
+            return results
+        
+        finally:
+            self.cleanup_temp_dir()
+
+    def cleanup_temp_dir(self):
+        if self.temp_dir.exists():
+            try:
+                shutil.rmtree(self.temp_dir, ignore_errors=True)
+                print("[OK] Cleaned up temporary files")
+            except Exception as e:
+                print(f"[WARNING] Could not clean up temp directory: {e}")
+
+def emit_for_template(docx_path, template_path, output_dir, temp_dir, converted_latex, media_map):
+    """Worker for convert_for_templates: emit one template's output from shared converted LaTeX"""
+    converter = SimplifiedDOCXConverter(docx_path, template_path, output_dir)
+    converter.temp_dir = Path(temp_dir)
+    converter.media_map = dict(media_map)
+    try:
+        converter.output_dir.mkdir(parents=True, exist_ok=True)
+        return converter.emit_output(converted_latex)
+    except Exception as e:
+        print(f"[ERROR] Conversion for {template_path} failed: {e}")
+        logger.exception("Detailed error information:")
+        return False
+
+def convert_documents(docx_paths, template_path, output_dir):
+    """
+    Convert many documents concurrently under one asyncio event loop.
+
+    Each document gets its own output and temp subdirectory named after it.
+    At most TOOL_CONCURRENCY[tool] pandoc/pdflatex processes run at a time.
+
+    Returns:
+        dict: DOCX path -> success
+    """
+    import asyncio
+
+    converters = []
+    used_names = set()
+    for docx_path in docx_paths:
+        name = Path(docx_path).stem
+        suffix = 2
+        while name in used_names:
+            name = f"{Path(docx_path).stem}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        converter = SimplifiedDOCXConverter(docx_path, template_path, Path(output_dir) / name)
+        converter.temp_dir = Path(TEMP_DIR) / name
+        converters.append(converter)
+
+    async def convert_all():
+        limits = {tool: asyncio.Semaphore(count) for tool, count in TOOL_CONCURRENCY.items()}
+        return await asyncio.gather(*(converter.convert_async(limits) for converter in converters))
+
+    results = asyncio.run(convert_all())
+    try:
+        os.rmdir(TEMP_DIR)
+    except OSError:
+        pass
+
+    for docx_path, converter, success in zip(docx_paths, converters, results):
+        status = "[OK]" if success else "[ERROR]"
+        print(f"{status} {docx_path} -> {converter.output_dir}")
+    return dict(zip(docx_paths, results))
+
+def check_import_time(modules=('simplified_docx_converter', 'ai_latex_formatter')):
+    """
+    Regression check for startup cost using `python -X importtime`.
+
+    Fails if importing a module pulls in one of LAZY_IMPORTS or takes longer
+    than IMPORT_TIME_BUDGET_MS.
+
+    Returns:
+        bool: True if every module is within budget
+    """
+    ok = True
+    for module in modules:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, cwd=Path(__file__).resolve().parent
+        )
+        if result.returncode != 0:
+            print(f"[ERROR] Importing {module} failed:\n{result.stderr[-800:]}")
+            ok = False
+            continue
+
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        imported = {}
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                imported[parts[2].strip()] = int(parts[1].strip())
 
-def main():
+        eager = [name for name in imported if name in LAZY_IMPORTS]
+        total_ms = imported.get(module, 0) / 1000
+
+        if eager:
+            print(f"[ERROR] {module} eagerly imports {', '.join(eager)}")
+            ok = False
+        if total_ms > IMPORT_TIME_BUDGET_MS:
+            print(f"[ERROR] {module} import took {total_ms:.1f} ms (budget {IMPORT_TIME_BUDGET_MS} ms)")
+            ok = False
+        if not eager and total_ms <= IMPORT_TIME_BUDGET_MS:
+            print(f"[OK] {module} imports in {total_ms:.1f} ms")
+    return ok
+
+def check_peak_memory(converted_tex, template=LATEX_TEMPLATE):
+    """
+    Regression check for merge memory use, measured with tracemalloc.
+
+    Merges a converted LaTeX file with the template and writes the result
+    to the null device, then fails if the traced peak exceeds
+    PEAK_MEMORY_FACTOR times the size of the input.
+
+    Returns:
+        bool: True if the peak is within budget
+    """
+    import tracemalloc
+
+    input_size = os.path.getsize(converted_tex)
+    converter = SimplifiedDOCXConverter(DOCX_FILE, template, OUTPUT_DIR)
+    template_preamble = converter.extract_preamble_from_template()
+
+    tracemalloc.start()
+    chunks = converter.merge_latex_with_template_preamble(converted_tex, template_preamble)
+    converter.write_document(chunks, os.devnull)
+    del chunks
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ratio = peak / max(input_size, 1)
+    if ratio > PEAK_MEMORY_FACTOR:
+        print(f"[ERROR] Merge peak memory {peak / 1e6:.1f} MB is {ratio:.1f}x the input "
+              f"(budget {PEAK_MEMORY_FACTOR}x)")
+        return False
+    print(f"[OK] Merge peak memory {peak / 1e6:.1f} MB is {ratio:.1f}x the input")
+    return True
+
+def check_reproducible(docx_path, template=LATEX_TEMPLATE):
+    """
+    Regression check for deterministic builds.
+
+    Converts the document twice, in separate processes and fresh working
+    directories with --deterministic and --no-cache, and fails if any output
+    file other than LaTeX's logs and auxiliary files differs byte for byte.
+
+    Returns:
+        bool: True if both builds are identical
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="reproducible_") as work_root:
+        outputs = []
+        for run in ('a', 'b'):
+            run_dir = Path(work_root) / run
+            run_dir.mkdir()
+            command = [sys.executable, str(Path(__file__).resolve()), str(Path(docx_path).resolve()),
+                       '-t', str(Path(template).resolve()), '-o', str(run_dir / "output"),
+                       '--deterministic', '--no-cache']
+            result = subprocess.run(command, cwd=run_dir, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"[ERROR] Build {run} failed:\n{result.stdout[-800:]}{result.stderr[-800:]}")
+                return False
+            files = {}
+            for path in sorted((run_dir / "output").rglob('*')):
+                relative = path.relative_to(run_dir / "output")
+                if (path.is_file() and path.suffix not in REPRODUCIBLE_SKIP_SUFFIXES
+                        and relative.parts[0] != CHAPTER_BUILD_DIR):
+                    files[relative.as_posix()] = SimplifiedDOCXConverter.file_sha256(path)
+            outputs.append(files)
+
+    first, second = outputs
+    differing = sorted(name for name in first.keys() | second.keys() if first.get(name) != second.get(name))
+    if differing:
+        print(f"[ERROR] Outputs differ between identical builds: {', '.join(differing)}")
+        return False
+    if 'paper.pdf' not in first:
+        print("[WARNING] No PDF was produced, only the LaTeX output was compared")
+    print(f"[OK] {len(first)} output files are byte-identical across builds")
+    return True
+
+def check_pdf_rebuild(docx_path, template=LATEX_TEMPLATE):
+    """
+    Regression check for the stage graph: an edit to the template's .cls
+    file must recompile the PDF even though paper.tex doesn't change.
+
+    Builds the document with a copy of the template and its class files
+    (--no-cache, so no cached PDF stands in for the build), appends a
+    comment to the copied .cls files and builds again.
+
+    Returns:
+        bool: True if the second build ran the pdf stage
+    """
+    import tempfile
+
+    template = Path(template).resolve()
+    with tempfile.TemporaryDirectory(prefix="pdf_rebuild_") as work_root:
+        template_dir = Path(work_root) / "template"
+        template_dir.mkdir()
+        shutil.copy(template, template_dir)
+        cls_files = list(template.parent.glob("*.cls"))
+        if not cls_files:
+            print(f"[ERROR] No .cls file next to {template}")
+            return False
+        for cls_file in cls_files:
+            shutil.copy(cls_file, template_dir)
+
+        command = [sys.executable, str(Path(__file__).resolve()), str(Path(docx_path).resolve()),
+                   '-t', str(template_dir / template.name), '-o', str(Path(work_root) / "output"), '--no-cache']
+        stages_run = []
+        for run in ('first', 'after .cls edit'):
+            result = subprocess.run(command, cwd=work_root, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"[ERROR] Build ({run}) failed:\n{result.stdout[-800:]}{result.stderr[-800:]}")
+                return False
+            stages = re.search(r'Stages run: (.*)', result.stdout)
+            stages_run.append(stages.group(1) if stages else '')
+            for cls_file in template_dir.glob("*.cls"):
+                with open(cls_file, 'a', encoding='utf-8') as f:
+                    f.write("\n% pdf rebuild check\n")
+
+    if 'pdf' not in stages_run[1].split(', '):
+        print(f"[ERROR] PDF not rebuilt after a .cls edit, stages run: {stages_run[1]}")
+        return False
+    print(f"[OK] .cls edit recompiled the PDF (stages run: {stages_run[1]})")
+    return True
+
+def report_cache_stats():
+    """
+    Print the cumulative hit rate and evictions per cache namespace, and what
+    each backend currently holds, for sizing CACHE_MAX_BYTES and CACHE_TTL.
+    """
+    cache = get_cache()
+    stats = cache.load_stats()
+    if not stats:
+        print("[WARNING] No cache statistics recorded yet")
+    for namespace, counts in sorted(stats.items()):
+        lookups = counts.get('hits', 0) + counts.get('misses', 0)
+        hit_rate = counts.get('hits', 0) / lookups if lookups else 0
+        print(f"{namespace:16} {hit_rate:6.1%} of {lookups} lookups hit, {counts.get('writes', 0)} writes, "
+              f"{counts.get('evictions', 0)} evicted, {counts.get('corrupt', 0)} corrupt")
+    for backend in cache.backends:
+        usage = backend.usage() if backend.persistent else None
+        if usage is None:
+            continue
+        total = sum(size for _, size in usage.values())
+        print(f"[OK] {backend.name} backend: {total / 1e6:.1f} of {backend.max_bytes / 1e6:.0f} MB")
+        for namespace, (entries, size) in sorted(usage.items()):
+            print(f"  {namespace:16} {entries} entries, {size / 1e6:.1f} MB")
+    return True
+
+def find_docx(path):
+    """
+    Resolve an input argument to a DOCX file.
+
+    A directory stands for the DOCX_FILE inside it or, failing that, its only
+    .docx file (Word lock files are ignored).
+
+    Returns:
+        str: Path of the DOCX file, or None if a directory has no single DOCX
+    """
+    directory = Path(path)
+    if not directory.is_dir():
+        return path
+    if (directory / DOCX_FILE).is_file():
+        return str(directory / DOCX_FILE)
+    candidates = [p for p in directory.glob("*.docx") if not p.name.startswith('~$')]
+    return str(candidates[0]) if len(candidates) == 1 else None
+
+def parse_args(argv=None):
+    """Parse command line options, defaulting to the configuration above"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simplified DOCX to LaTeX Converter")
+    parser.add_argument('docx', nargs='?', default=DOCX_FILE,
+                        help="Input DOCX file, or a directory containing it")
+    parser.add_argument('-t', '--template', default=LATEX_TEMPLATE, help="LaTeX template (.tex)")
+    parser.add_argument('--templates', nargs='+', metavar='TEMPLATE',
+                        help="Emit for several templates in parallel, one output subdirectory each")
+    parser.add_argument('--batch', nargs='+', metavar='DOCX',
+                        help="Convert several DOCX files concurrently, one output subdirectory each")
+    parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR, help="Output directory")
+    parser.add_argument('--no-pdf', action='store_true', help="Skip PDF compilation")
+    parser.add_argument('--check-import-time', action='store_true',
+                        help="Check that heavy dependencies are imported lazily and exit")
+    parser.add_argument('--refresh-templates', nargs='+', metavar='DIR',
+                        help="Scan template directories into the template registry and exit")
+    parser.add_argument('--check-peak-memory', metavar='CONVERTED_TEX',
+                        help="Check merge peak memory on a converted LaTeX file and exit")
+    parser.add_argument('--deterministic', action='store_true',
+                        help="Byte-identical output for identical inputs (see DETERMINISTIC_BUILD)")
+    parser.add_argument('--no-cache', action='store_true', help="Don't read or write any cache")
+    parser.add_argument('--draft', action='store_true',
+                        help="Only typeset the sections changed since the last build, into paper-draft.pdf "
+                             "(splits the body into per-section \\include files)")
+    parser.add_argument('--check-reproducible', metavar='DOCX',
+                        help="Build DOCX twice from scratch, check the outputs are byte-identical and exit")
+    parser.add_argument('--remote-cache', metavar='URL',
+                        help="Share artifacts through the remote cache at URL (adds the 'http' cache backend)")
+    parser.add_argument('--check-pdf-rebuild', metavar='DOCX',
+                        help="Build DOCX, edit a copy of the template's .cls, check the PDF is rebuilt and exit")
+    parser.add_argument('--cache-stats', action='store_true',
+                        help="Print cache hit rates, evictions and sizes per namespace and exit")
+    args = parser.parse_args(argv)
+
+    def resolve(path):
+        docx = find_docx(path)
+        if docx is None:
+            parser.error(f"no single .docx file in directory {path}, pass the file itself")
+        return docx
+
+    args.docx = resolve(args.docx)
+    if args.check_reproducible:
+        args.check_reproducible = resolve(args.check_reproducible)
+    if args.check_pdf_rebuild:
+        args.check_pdf_rebuild = resolve(args.check_pdf_rebuild)
+    if args.batch:
+        args.batch = [resolve(path) for path in args.batch]
+    return args
+
+def main(argv=None):
     """Run the simplified converter"""
+    global COMPILE_PDF, CACHE_BACKENDS, CACHE_REMOTE_URL, DETERMINISTIC_BUILD, DRAFT_BUILD, SPLIT_SECTIONS
+
+    args = parse_args(argv)
+    if args.deterministic:
+        DETERMINISTIC_BUILD = True
+    if args.draft:
+        DRAFT_BUILD = SPLIT_SECTIONS = True
+    if args.no_cache:
+        CACHE_BACKENDS = []
+    elif args.remote_cache:
+        CACHE_REMOTE_URL = args.remote_cache
+        if 'http' not in CACHE_BACKENDS:
+            CACHE_BACKENDS = CACHE_BACKENDS + ['http']
+    if args.check_import_time:
+        return check_import_time()
+    if args.refresh_templates:
+        from template_registry import TemplateRegistry
+        registry = TemplateRegistry(cache=get_cache())
+        indexed = registry.refresh(args.refresh_templates)
+        print(f"[OK] Indexed {indexed} changed templates, {len(registry.templates)} in registry")
+        return True
+    if args.check_peak_memory:
+        return check_peak_memory(args.check_peak_memory, args.template)
+    if args.cache_stats:
+        return report_cache_stats()
+    if args.check_reproducible:
+        return check_reproducible(args.check_reproducible, args.template)
+    if args.check_pdf_rebuild:
+        return check_pdf_rebuild(args.check_pdf_rebuild, args.template)
+    if args.no_pdf:
+        COMPILE_PDF = False
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
     print("Simplified DOCX to LaTeX Converter (Custom Table Processing)")
     print("=" * 60)
     
-    if not Path(DOCX_FILE).exists():
-        print(f"[ERROR] Input file not found: {DOCX_FILE}")
-        print("Please update the DOCX_FILE variable with the correct path.")
-        return False
+    if args.batch:
+        results = convert_documents(args.batch, args.template, args.output_dir)
+        success = all(results.values())
+    else:
+        if not Path(args.docx).is_file():
+            print(f"[ERROR] Input file not found: {args.docx}")
+            print("Please update the DOCX_FILE variable with the correct path.")
+            return False
+        
+        converter = SimplifiedDOCXConverter(args.docx, args.template, args.output_dir)
+        if args.templates:
+            results = converter.convert_for_templates(args.templates)
+            success = bool(results) and all(results.values())
+        else:
+            success = converter.convert()
     
-    converter = SimplifiedDOCXConverter(DOCX_FILE, LATEX_TEMPLATE, OUTPUT_DIR)
-    success = converter.convert()
+    cache_summary = get_cache().summary()
+    if cache_summary:
+        print(f"[OK] Cache hits this run: {cache_summary}")
     
     if success:
         print("\n" + "="*50)
@@ -782,6 +2878,7 @@ def main():
         print("\n" + "="*50)
         print("CONVERSION FAILED")
         print("="*50)
+    return success
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if main() else 1)
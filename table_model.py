@@ -0,0 +1,397 @@
+import re
+from array import array
+
+# Row kinds
+DATA_ROW = 0
+RULE_ROW = 1    # \toprule, \midrule, \hline, \cline{..}, \noalign{..}, ...
+MARKER_ROW = 2  # longtable head/foot markers such as \endhead
+
+RULE_COMMANDS = {'toprule', 'midrule', 'bottomrule', 'hline', 'cline', 'cmidrule',
+                 'addlinespace', 'specialrule', 'noalign'}
+# Rules that take brace arguments, e.g. \cline{2-3} or \cmidrule(lr){1-2}
+RULES_WITH_ARGUMENTS = {'cline', 'cmidrule', 'specialrule', 'noalign'}
+MARKER_COMMANDS = {'endhead', 'endfirsthead', 'endfoot', 'endlastfoot'}
+
+# Rows removed by the cleanup, everything else is kept as written
+DROPPED_COMMANDS = {'toprule', 'midrule', 'bottomrule', 'noalign', 'endhead', 'endlastfoot'}
+# Rules/markers that mark the row before them as a header row
+HEADER_COMMANDS = {'midrule', 'endhead', 'endfirsthead'}
+
+BEGIN_PATTERN = re.compile(r'\\begin\{(longtable|tabular)\}')
+MINIPAGE_PATTERN = re.compile(r'\\begin\{minipage\}.*?\\end\{minipage\}', re.DOTALL)
+COMMAND_PATTERN = re.compile(r'\\([A-Za-z]+)')
+MULTICOLUMN_PATTERN = re.compile(r'\s*\\multicolumn\s*\{\s*(\d+)\s*\}')
+MINIPAGE_WRAPPER_PATTERN = re.compile(r'\\begin\{minipage\}(?:\s*\[[^\]]*\])*\s*\{[^}]*\}|\\end\{minipage\}')
+# Cells kept verbatim in a skeleton: structure, not data
+SKELETON_VERBATIM_PATTERN = re.compile(r'\s*\\(?:caption|label)\b')
+
+
+def skip_group(text, i, open_char='{', close_char='}'):
+    """Return the index just past the balanced group starting at text[i]"""
+    depth = 0
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == open_char:
+            depth += 1
+        elif char == close_char:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def skip_arguments(text, i, openers='{[('):
+    """Skip whitespace and any {..}, [..] or (..) arguments following a command"""
+    n = len(text)
+    while True:
+        j = i
+        while j < n and text[j] in ' \t':
+            j += 1
+        if j < n and text[j] in openers:
+            close_char = {'{': '}', '[': ']', '(': ')'}[text[j]]
+            i = skip_group(text, j, text[j], close_char)
+        else:
+            return i
+
+
+def count_colspec_columns(colspec):
+    """Count the columns declared by a tabular/longtable column specification"""
+    count = 0
+    i = 0
+    n = len(colspec)
+    while i < n:
+        char = colspec[i]
+        if char in 'pmb' and i + 1 < n and colspec[i + 1] == '{':
+            count += 1
+            i = skip_group(colspec, i + 1)
+        elif char in '@!><' and i + 1 < n and colspec[i + 1] == '{':
+            i = skip_group(colspec, i + 1)
+        elif char == '*' and i + 1 < n and colspec[i + 1] == '{':
+            end_count = skip_group(colspec, i + 1)
+            end_spec = skip_group(colspec, end_count)
+            try:
+                repeat = int(colspec[i + 2:end_count - 1].strip())
+            except ValueError:
+                repeat = 1
+            count += repeat * count_colspec_columns(colspec[end_count + 1:end_spec - 1])
+            i = end_spec
+        elif char in 'lcrXSsJL':
+            count += 1
+            i += 1
+        else:
+            i += 1
+    return count
+
+
+class TableGrid:
+    """
+    Compact structural model of one tabular/longtable environment.
+
+    The table is parsed once, left to right. Escaped characters (\\&, \\\\%),
+    nested groups and environments, multi-line cells and \\multicolumn spans
+    are handled structurally instead of by counting characters per line.
+    Rows are stored in parallel arrays: the raw source of each row (used for
+    emission), its kind and the range of its cells in the flat cell list.
+    """
+
+    __slots__ = ('env', 'begin', 'colspec', 'end', 'tail', 'cells', 'spans',
+                 'row_text', 'row_kind', 'row_command', 'row_start', 'ncols')
+
+    def __init__(self):
+        self.env = ''
+        self.begin = ''           # \begin{env}[..]{colspec}
+        self.colspec = None
+        self.end = ''             # \end{env} and anything after it
+        self.tail = ''            # whitespace before \end{env}
+        self.cells = []           # cell text, flat across rows
+        self.spans = array('H')   # columns spanned by each cell
+        self.row_text = []        # raw source of each row
+        self.row_kind = array('B')
+        self.row_command = []     # rule/marker command name, '' for data rows
+        self.row_start = array('I', [0])  # row r owns cells[row_start[r]:row_start[r + 1]]
+        self.ncols = 0
+
+    @classmethod
+    def parse(cls, table_str):
+        grid = cls()
+        body_start = 0
+        body_end = len(table_str)
+
+        begin_match = BEGIN_PATTERN.match(table_str.lstrip())
+        if begin_match:
+            offset = len(table_str) - len(table_str.lstrip())
+            grid.env = begin_match.group(1)
+            i = offset + begin_match.end()
+            # Optional position argument, then the column specification
+            while i < len(table_str) and table_str[i] in ' \t\n':
+                i += 1
+            if i < len(table_str) and table_str[i] == '[':
+                i = skip_group(table_str, i, '[', ']')
+            while i < len(table_str) and table_str[i] in ' \t\n':
+                i += 1
+            if i < len(table_str) and table_str[i] == '{':
+                colspec_end = skip_group(table_str, i)
+                grid.colspec = table_str[i + 1:colspec_end - 1]
+                i = colspec_end
+            grid.begin = table_str[:i]
+            body_start = i
+
+            end_marker = table_str.rfind(f'\\end{{{grid.env}}}')
+            if end_marker >= body_start:
+                body_end = end_marker
+        grid.end = table_str[body_end:]
+
+        grid._parse_body(table_str, body_start, body_end)
+
+        if grid.colspec is not None:
+            grid.ncols = count_colspec_columns(grid.colspec)
+        if not grid.ncols:
+            grid.ncols = max((grid.row_width(r) for r in range(grid.num_rows)
+                              if grid.row_kind[r] == DATA_ROW), default=1)
+        return grid
+
+    def _parse_body(self, text, i, n):
+        row_cells = []
+        depth = 0
+
+        i = self._consume_rules(text, i, n)
+        row_begin = cell_begin = i
+
+        while i < n:
+            char = text[i]
+            if char == '\\':
+                if i + 1 < n and text[i + 1] == '\\' and depth == 0:
+                    row_cells.append(text[cell_begin:i])
+                    i = skip_arguments(text, i + 2 + (i + 2 < n and text[i + 2] == '*'), '[')
+                    self._add_row(text[row_begin:i], DATA_ROW, '', row_cells)
+                    row_cells = []
+                    i = self._consume_rules(text, i, n)
+                    row_begin = cell_begin = i
+                    continue
+                command = COMMAND_PATTERN.match(text, i)
+                if not command:
+                    i += 2  # control symbol such as \& or \%
+                    continue
+                name = command.group(1)
+                if name == 'tabularnewline' and depth == 0:
+                    row_cells.append(text[cell_begin:i])
+                    i = command.end()
+                    self._add_row(text[row_begin:i], DATA_ROW, '', row_cells)
+                    row_cells = []
+                    i = self._consume_rules(text, i, n)
+                    row_begin = cell_begin = i
+                    continue
+                if name == 'begin':
+                    depth += 1
+                elif name == 'end':
+                    depth -= 1
+                i = command.end()
+            elif char == '{':
+                depth += 1
+                i += 1
+            elif char == '}':
+                depth -= 1
+                i += 1
+            elif char == '&' and depth == 0:
+                row_cells.append(text[cell_begin:i])
+                i += 1
+                cell_begin = i
+            elif char == '%':
+                newline = text.find('\n', i)
+                i = n if newline == -1 or newline > n else newline
+            else:
+                i += 1
+
+        remainder = text[row_begin:n]
+        if remainder.strip():
+            # Last row without a terminating \\
+            row_cells.append(text[cell_begin:n])
+            self._add_row(remainder, DATA_ROW, '', row_cells)
+        else:
+            self.tail = remainder
+
+    def _consume_rules(self, text, i, n):
+        """Record rule and marker rows at the start of a row, return the new row start"""
+        while True:
+            j = i
+            while j < n and text[j] in ' \t\n':
+                j += 1
+            command = COMMAND_PATTERN.match(text, j)
+            if not command or command.end() > n:
+                return i
+            name = command.group(1)
+            if name in RULE_COMMANDS:
+                openers = '{[(' if name in RULES_WITH_ARGUMENTS else '['
+                end = skip_arguments(text, command.end(), openers)
+                self._add_row(text[i:end], RULE_ROW, name, [])
+            elif name in MARKER_COMMANDS:
+                end = command.end()
+                self._add_row(text[i:end], MARKER_ROW, name, [])
+            else:
+                return i
+            i = end
+
+    def _add_row(self, source, kind, command, cells):
+        for cell in cells:
+            multicolumn = MULTICOLUMN_PATTERN.match(cell)
+            self.cells.append(cell)
+            self.spans.append(int(multicolumn.group(1)) if multicolumn else 1)
+        self.row_text.append(source)
+        self.row_kind.append(kind)
+        self.row_command.append(command)
+        self.row_start.append(len(self.cells))
+
+    @property
+    def num_rows(self):
+        return len(self.row_text)
+
+    def row_cells(self, row):
+        return self.cells[self.row_start[row]:self.row_start[row + 1]]
+
+    def row_width(self, row):
+        return sum(self.spans[self.row_start[row]:self.row_start[row + 1]])
+
+    def header_row(self):
+        """Index of the first data row if a \\midrule or longtable head marker follows it"""
+        for row in range(self.num_rows):
+            if self.row_kind[row] != DATA_ROW:
+                continue
+            for following in range(row + 1, self.num_rows):
+                if self.row_kind[following] == DATA_ROW:
+                    break
+                if self.row_command[following] in HEADER_COMMANDS:
+                    return row
+            return None
+        return None
+
+    def skeleton(self, placeholder='@@{}@@'):
+        """
+        The table with every non-empty cell's content replaced by a numbered
+        placeholder, keeping rules, colspec, the &/\\\\ layout and
+        \\multicolumn spans. Minipage wrappers are dropped from the contents.
+
+        Returns:
+            tuple: (skeleton LaTeX, list of cell contents indexed by placeholder number)
+        """
+        contents = []
+        parts = [self.begin]
+        for row in range(self.num_rows):
+            source = self.row_text[row]
+            cells = self.row_cells(row)
+            if not cells:
+                parts.append(source)
+                continue
+            # A data row is its cells joined by & followed by the row terminator
+            terminator = source[len('&'.join(cells)):]
+            skeleton_cells = []
+            for cell in cells:
+                skeleton_cells.append(self._skeleton_cell(cell, placeholder, contents))
+            parts.append('&'.join(skeleton_cells) + terminator)
+        parts.append(self.tail)
+        parts.append(self.end)
+        return ''.join(parts), contents
+
+    @staticmethod
+    def _skeleton_cell(cell, placeholder, contents):
+        multicolumn = MULTICOLUMN_PATTERN.match(cell)
+        if multicolumn:
+            # Keep \multicolumn{n}{spec}{..} and only hide its content argument
+            groups = []
+            i = multicolumn.end()
+            while len(groups) < 2:
+                while i < len(cell) and cell[i] in ' \t\n':
+                    i += 1
+                if i >= len(cell) or cell[i] != '{':
+                    break
+                groups.append((i, skip_group(cell, i)))
+                i = groups[-1][1]
+            if len(groups) == 2:
+                start, end = groups[1]
+                inner = TableGrid._skeleton_cell(cell[start + 1:end - 1], placeholder, contents)
+                return cell[:start + 1] + inner + cell[end - 1:]
+
+        stripped = cell.strip()
+        if not stripped or SKELETON_VERBATIM_PATTERN.match(cell):
+            return cell
+        leading = cell[:len(cell) - len(cell.lstrip())]
+        trailing = cell[len(cell.rstrip()):]
+        contents.append(MINIPAGE_WRAPPER_PATTERN.sub('', stripped).strip())
+        return leading + placeholder.format(len(contents) - 1) + trailing
+
+    def normalize(self):
+        """
+        Stricter rewrite for tables that don't compile after clean(): a
+        longtable becomes a tabular (head/foot markers and caption/label rows
+        dropped), minipage wrappers are removed and short rows are padded to
+        the column count.
+        """
+        begin, end = self.begin, self.end
+        if self.env == 'longtable' and self.colspec is not None:
+            begin = f'\\begin{{tabular}}{{{self.colspec}}}'
+            end = '\\end{tabular}' + end[len('\\end{longtable}'):]
+
+        parts = [begin]
+        for row in range(self.num_rows):
+            source = self.row_text[row]
+            if self.row_kind[row] == MARKER_ROW:
+                continue
+            cells = self.row_cells(row)
+            if cells:
+                if SKELETON_VERBATIM_PATTERN.match(cells[0]) and len(cells) == 1:
+                    continue
+                terminator = source[len('&'.join(cells)):]
+                cells = [MINIPAGE_WRAPPER_PATTERN.sub('', cell) for cell in cells]
+                if not terminator.strip():
+                    # Last row without \\: terminate it before its trailing whitespace
+                    last = cells[-1]
+                    cells[-1] = last.rstrip()
+                    terminator = ' \\\\' + last[len(last.rstrip()):] + terminator
+                missing = self.ncols - self.row_width(row)
+                if missing > 0:
+                    cells.extend([' '] * missing)
+                source = '&'.join(cells) + terminator
+            parts.append(source)
+        parts.append(self.tail)
+        parts.append(end)
+
+        lines = ''.join(parts).split('\n')
+        return '\n'.join(line for line in lines if line.strip() != '')
+
+    def clean(self):
+        """
+        Emit the cleaned table: booktabs rules, head/foot markers, minipage
+        blocks and the header row are removed, other rows are kept as written.
+        """
+        header = self.header_row()
+        parts = [self.begin]
+        for row in range(self.num_rows):
+            if row == header or self.row_command[row] in DROPPED_COMMANDS:
+                continue
+            source = self.row_text[row]
+            if self.row_kind[row] == DATA_ROW:
+                source = MINIPAGE_PATTERN.sub('', source)
+            parts.append(source)
+        parts.append(self.tail)
+        parts.append(self.end)
+
+        lines = ''.join(parts).split('\n')
+        return '\n'.join(line for line in lines if line.strip() != '')
+
+
+def clean_latex_table(table_str):
+    """Parse a table once and return its cleaned LaTeX"""
+    return TableGrid.parse(table_str).clean()
+
+
+def parse_and_clean(table_str):
+    """
+    Return (column count, cleaned LaTeX) for a table.
+    Top-level so it can be dispatched to worker processes.
+    """
+    grid = TableGrid.parse(table_str)
+    return grid.ncols, grid.clean()
@@ -0,0 +1,214 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+TEMPLATE_INDEX = ".template_registry.json"
+INDEX_VERSION = 1
+
+DOCUMENTCLASS_PATTERN = re.compile(r'\\documentclass(?:\[(.*?)\])?\{(.*?)\}', re.DOTALL)
+PACKAGE_PATTERN = re.compile(r'\\(?:usepackage|RequirePackage)\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}')
+EXECUTE_OPTIONS_PATTERN = re.compile(r'\\ExecuteOptions\{([^}]*)\}')
+
+
+def read_text(path):
+    """Read a text file as utf-8, falling back to latin-1 (which never fails)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        return raw.decode('utf-8'), raw
+    except UnicodeDecodeError:
+        return raw.decode('latin-1'), raw
+
+
+def extract_preamble(tex_content):
+    """Everything before \\begin{document}, or the whole file if it has none"""
+    begin_doc_match = re.search(r'\\begin\{document\}', tex_content)
+    if begin_doc_match:
+        return tex_content[:begin_doc_match.start()].strip()
+    return tex_content.strip()
+
+
+def detect_layout(tex_content, cls_content=None):
+    """
+    Column layout from \\documentclass options, then the class's
+    \\ExecuteOptions defaults; onecolumn if neither says otherwise.
+    """
+    match = re.search(r'\\documentclass\[(.*?)\]\{.*?\}', tex_content)
+    if match:
+        options_list = [opt.strip() for opt in match.group(1).split(',')]
+        if 'onecolumn' in options_list:
+            return 'onecolumn'
+        elif 'twocolumn' in options_list:
+            return 'twocolumn'
+
+    if cls_content:
+        for options_str in EXECUTE_OPTIONS_PATTERN.findall(cls_content):
+            options = [opt.strip() for opt in options_str.split(',')]
+            if 'twocolumn' in options:
+                return 'twocolumn'
+            elif 'onecolumn' in options:
+                return 'onecolumn'
+
+    return 'onecolumn'
+
+
+def parse_packages(preamble):
+    """Package names loaded with \\usepackage/\\RequirePackage, in order of first use"""
+    packages = []
+    for names in PACKAGE_PATTERN.findall(preamble):
+        for name in names.split(','):
+            name = name.strip()
+            if name and name not in packages:
+                packages.append(name)
+    return packages
+
+
+def find_class_file(template_directory, class_name=None):
+    """
+    Find the .cls file for a template: the file named after its document
+    class if present, otherwise the first .cls in the directory tree.
+    """
+    if class_name:
+        for candidate in glob.glob(os.path.join(template_directory, "**", f"{class_name}.cls"), recursive=True):
+            return candidate
+    cls_files = glob.glob(os.path.join(template_directory, "*.cls"))
+    if not cls_files:
+        cls_files = glob.glob(os.path.join(template_directory, "**", "*.cls"), recursive=True)
+    return cls_files[0] if cls_files else None
+
+
+class TemplateRegistry:
+    """
+    Persistent index of LaTeX templates.
+
+    Each template entry stores its preamble, column layout, .cls path,
+    required packages and content hashes, keyed by resolved path so a job
+    looks its template up in O(1). Entries are validated against the file's
+    mtime and size (and those of its .cls) and only re-parsed when stale.
+    With a cache manager the index is kept in its 'templates' namespace
+    instead of the index file.
+    """
+
+    def __init__(self, index_path=TEMPLATE_INDEX, cache=None):
+        self.index_path = Path(index_path)
+        self.cache = cache
+        self.templates = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if self.cache is not None:
+            index = self.cache.get_json('templates', 'index')
+            if index is None:
+                return
+        else:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                return
+        if index.get('version') == INDEX_VERSION:
+            self.templates = index.get('templates', {})
+
+    def save(self):
+        """Write the index atomically"""
+        if not self.dirty:
+            return
+        if self.cache is not None:
+            self.cache.put_json('templates', 'index', {'version': INDEX_VERSION, 'templates': self.templates})
+            self.dirty = False
+            return
+        temp_path = self.index_path.with_name(self.index_path.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'templates': self.templates}, f, indent=1)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _is_stale(self, key, entry):
+        if self._stat(key) != entry.get('stat'):
+            return True
+        cls_path = entry.get('cls_path')
+        return bool(cls_path) and self._stat(cls_path) != entry.get('cls_stat')
+
+    def _index_template(self, key):
+        tex_content, raw = read_text(key)
+        docclass = DOCUMENTCLASS_PATTERN.search(tex_content)
+        class_name = docclass.group(2).strip() if docclass else None
+
+        cls_path = find_class_file(str(Path(key).parent), class_name)
+        cls_content, cls_raw = read_text(cls_path) if cls_path else (None, b'')
+
+        preamble = extract_preamble(tex_content)
+        entry = {
+            'stat': self._stat(key),
+            'sha256': hashlib.sha256(raw).hexdigest(),
+            'documentclass': class_name,
+            'preamble': preamble,
+            'layout': detect_layout(tex_content, cls_content),
+            'cls_path': cls_path,
+            'cls_stat': self._stat(cls_path) if cls_path else None,
+            'cls_sha256': hashlib.sha256(cls_raw).hexdigest() if cls_path else None,
+            'packages': parse_packages(preamble),
+        }
+        self.templates[key] = entry
+        self.dirty = True
+        return entry
+
+    def lookup(self, template_path):
+        """
+        Return the index entry for a template, re-indexing it if it changed.
+
+        Returns:
+            dict: Template metadata or None if the file doesn't exist
+        """
+        key = str(Path(template_path).resolve())
+        entry = self.templates.get(key)
+        if entry is None or self._is_stale(key, entry):
+            if not os.path.exists(key):
+                return None
+            entry = self._index_template(key)
+            self.save()
+        return entry
+
+    def refresh(self, directories):
+        """
+        Scan template directories, indexing new or changed templates and
+        dropping entries whose files are gone.
+
+        Returns:
+            int: Number of templates (re)indexed
+        """
+        indexed = 0
+        roots = [str(Path(directory).resolve()) for directory in directories]
+        for root in roots:
+            for tex_path in glob.glob(os.path.join(root, "**", "*.tex"), recursive=True):
+                key = str(Path(tex_path).resolve())
+                entry = self.templates.get(key)
+                if entry is not None and not self._is_stale(key, entry):
+                    continue
+                tex_content, _ = read_text(key)
+                # Only standalone documents are templates, not \input fragments
+                if not DOCUMENTCLASS_PATTERN.search(tex_content):
+                    continue
+                self._index_template(key)
+                indexed += 1
+
+        for key in list(self.templates):
+            if any(key.startswith(root + os.sep) for root in roots) and not os.path.exists(key):
+                del self.templates[key]
+                self.dirty = True
+
+        self.save()
+        return indexed
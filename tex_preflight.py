@@ -0,0 +1,232 @@
+import functools
+import hashlib
+import os
+import re
+import subprocess
+from pathlib import Path
+
+# Font families loaded by common font packages (NFSS family names)
+FONT_PACKAGES = {
+    'times': ['ptm', 'phv', 'pcr'],
+    'mathptmx': ['ptm'],
+    'mathptm': ['ptm'],
+    'helvet': ['phv'],
+    'courier': ['pcr'],
+    'palatino': ['ppl', 'phv', 'pcr'],
+    'mathpazo': ['ppl'],
+    'avant': ['pag'],
+    'bookman': ['pbk', 'pag', 'pcr'],
+    'newcent': ['pnc', 'pag', 'pcr'],
+    'charter': ['bch'],
+}
+
+# Latin Modern Type 1 families used in place of missing ones
+FONT_SUBSTITUTES = {
+    'phv': 'lmss',
+    'pag': 'lmss',
+    'pcr': 'lmtt',
+}
+DEFAULT_SUBSTITUTE = 'lmr'
+
+# Symbol fonts (U encoding, no text substitute)
+SYMBOL_FAMILIES = {'pzd', 'psy'}
+
+# Berry encoding suffixes of the TFM names, per LaTeX font encoding
+ENCODING_SUFFIXES = {'OT1': '7t', 'T1': '8t'}
+
+FAMILY_PATTERNS = [
+    re.compile(r'\\renewcommand\s*\{?\\(?:rm|sf|tt)default\}?\s*\{(\w+)\}'),
+    re.compile(r'\\fontfamily\s*\{(\w+)\}'),
+]
+PACKAGE_PATTERN = re.compile(r'\\(?:usepackage|RequirePackage)\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}')
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*')
+CLASS_PATTERN = re.compile(r'\\(?:documentclass|LoadClass)\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}')
+
+
+def kpsewhich(file_names):
+    """
+    Resolve many TeX files with a single kpsewhich call.
+
+    Returns:
+        dict: Mapping of file name to its path, or None if not found;
+              None instead of a dict when kpsewhich isn't available
+    """
+    file_names = list(dict.fromkeys(file_names))
+    if not file_names:
+        return {}
+    try:
+        # No -must-exist: never let the lookup itself trigger mktex* scripts
+        result = subprocess.run(['kpsewhich', *file_names], capture_output=True, text=True, timeout=60)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+
+    found = {Path(line.strip()).name: line.strip() for line in result.stdout.splitlines() if line.strip()}
+    return {name: found.get(name) for name in file_names}
+
+
+@functools.lru_cache(maxsize=None)
+def toolchain_version():
+    try:
+        result = subprocess.run(['kpsewhich', '--version'], capture_output=True, text=True, timeout=30)
+        return result.stdout.split('\n', 1)[0].strip()
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return ''
+
+
+def preflight_cache(cache):
+    """The given cache manager, or the process-wide one"""
+    if cache is not None:
+        return cache
+    from cache_manager import shared_cache
+    return shared_cache()
+
+
+def resolve_files(file_names, cache=None):
+    """
+    kpsewhich lookup that caches only the files it found, per file list and
+    toolchain version. Names that were missing are looked up again on every
+    call, so packages and fonts installed since are picked up immediately.
+
+    Returns:
+        dict: Mapping of file name to its path, or None if not found;
+              None instead of a dict when kpsewhich isn't available
+    """
+    file_names = list(dict.fromkeys(file_names))
+    key = hashlib.sha256('\0'.join([*file_names, toolchain_version()]).encode('utf-8')).hexdigest()
+    cache = preflight_cache(cache)
+    found = cache.get_json('preflight', f'files:{key}') or {}
+
+    unresolved = [name for name in file_names if name not in found]
+    if unresolved:
+        resolved = kpsewhich(unresolved)
+        if resolved is None:
+            return None
+        newly_found = {name: path for name, path in resolved.items() if path}
+        if newly_found:
+            found.update(newly_found)
+            cache.put_json('preflight', f'files:{key}', found)
+    return {name: found.get(name) for name in file_names}
+
+
+def template_fonts(preamble, cls_content=''):
+    """
+    Font families and encodings a template selects, from its preamble and
+    class: \\rmdefault/\\sfdefault/\\ttdefault, \\fontfamily and font packages.
+
+    Returns:
+        tuple: (sorted family names, sorted font encodings)
+    """
+    families = set()
+    encodings = {'OT1'}
+    for source in (cls_content or '', preamble):
+        source = COMMENT_PATTERN.sub('', source)
+        for pattern in FAMILY_PATTERNS:
+            families.update(pattern.findall(source))
+        for options, names in PACKAGE_PATTERN.findall(source):
+            for name in names.split(','):
+                name = name.strip()
+                families.update(FONT_PACKAGES.get(name, []))
+                if name == 'fontenc':
+                    encodings.update(opt.strip() for opt in options.split(',') if opt.strip() in ENCODING_SUFFIXES)
+    # Only three-letter Berry families have predictable TFM names
+    families = {family for family in families
+                if re.fullmatch(r'[a-z]{3}', family) and family not in SYMBOL_FAMILIES}
+    return sorted(families), sorted(encodings)
+
+
+def substitution_preamble(family, encoding, substitute):
+    """NFSS declarations that map every shape of a missing family to a substitute"""
+    lines = [f'\\DeclareFontFamily{{{encoding}}}{{{family}}}{{}}']
+    for series in ('m', 'b', 'bx'):
+        target_series = 'bx' if series == 'b' else series
+        for shape in ('n', 'it', 'sl', 'sc'):
+            lines.append(f'\\DeclareFontShape{{{encoding}}}{{{family}}}{{{series}}}{{{shape}}}'
+                         f'{{<->ssub * {substitute}/{target_series}/{shape}}}{{}}')
+    return '\n'.join(lines)
+
+
+def check_fonts(preamble, cls_content='', cache=None):
+    """
+    Resolve a template's fonts with one batched kpsewhich lookup; found
+    files are cached in the 'preflight' namespace (see resolve_files).
+
+    Returns:
+        dict: 'families' checked, 'missing' [family, encoding] pairs,
+              'substitutions' preamble text (may be empty) and 'checked'
+              (False if kpsewhich isn't available)
+    """
+    families, encodings = template_fonts(preamble, cls_content)
+    wanted = {}
+    for family in families:
+        for encoding in encodings:
+            suffix = ENCODING_SUFFIXES[encoding]
+            wanted[(family, encoding)] = f'{family}r{suffix}.tfm'
+    substitute_files = {
+        (substitute, encoding): f'{encoding.lower()}{substitute}.fd'
+        for substitute in set(FONT_SUBSTITUTES.values()) | {DEFAULT_SUBSTITUTE}
+        for encoding in encodings
+    }
+
+    resolved = resolve_files(list(wanted.values()) + list(substitute_files.values()), cache)
+    if resolved is None:
+        return {'families': families, 'missing': [], 'substitutions': '', 'checked': False}
+
+    missing = []
+    substitutions = []
+    for (family, encoding), tfm in wanted.items():
+        if resolved.get(tfm):
+            continue
+        missing.append([family, encoding])
+        substitute = FONT_SUBSTITUTES.get(family, DEFAULT_SUBSTITUTE)
+        if resolved.get(substitute_files[(substitute, encoding)]):
+            substitutions.append(substitution_preamble(family, encoding, substitute))
+
+    return {
+        'families': families,
+        'missing': missing,
+        'substitutions': '\n'.join(substitutions),
+        'checked': True,
+    }
+
+
+def template_requirements(preamble, cls_content='', extra_packages=()):
+    """
+    TeX files a template needs: its class, the classes it loads and every
+    package from \\usepackage/\\RequirePackage in the preamble and class.
+
+    Returns:
+        list: File names such as 'ieeetj.cls' or 'booktabs.sty', in order of first use
+    """
+    files = []
+    for source in (preamble, cls_content or ''):
+        source = COMMENT_PATTERN.sub('', source)
+        for name in CLASS_PATTERN.findall(source):
+            files.append(f'{name.strip()}.cls')
+        for _, names in PACKAGE_PATTERN.findall(source):
+            files.extend(f'{name.strip()}.sty' for name in names.split(','))
+    files.extend(f'{name}.sty' for name in extra_packages)
+    # Skip names built from macros (e.g. \\RequirePackage{\\@fontpkg} in a class)
+    files = [name for name in files if re.fullmatch(r'[\w.\-]+\.(?:cls|sty)', name)]
+    return list(dict.fromkeys(files))
+
+
+def check_packages(preamble, cls_content='', extra_packages=(), search_dirs=(), cache=None):
+    """
+    Resolve a template's classes and packages with one batched kpsewhich
+    lookup; found files are cached (see resolve_files). Files found in
+    search_dirs (e.g. the template directory) count as available.
+
+    Returns:
+        dict: 'files' checked, 'missing' file names and 'checked'
+              (False if kpsewhich isn't available)
+    """
+    files = template_requirements(preamble, cls_content, extra_packages)
+    local = {name for name in files
+             if any(os.path.isfile(os.path.join(directory, name)) for directory in search_dirs)}
+
+    resolved = resolve_files([name for name in files if name not in local], cache)
+    if resolved is None:
+        return {'files': files, 'missing': [], 'checked': False}
+
+    missing = [name for name in files if not resolved.get(name) and name not in local]
+    return {'files': files, 'missing': missing, 'checked': True}